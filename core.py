@@ -0,0 +1,1310 @@
+"""
+Core digest logic shared by the Streamlit app and the CLI scripts.
+
+Fetching papers from arXiv, scoring them, summarising abstracts via OpenRouter,
+formatting them as HTML and sending the digest email all live here. This module
+deliberately does not import Streamlit, so `daily_digest.py` starts quickly.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import functools
+import hashlib
+import html
+import os
+import re
+import smtplib
+import sqlite3
+import ssl
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from string import Template
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+import requests  # pip install requests
+import json
+from dotenv import load_dotenv  # pip install python-dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# sendgrid is imported where it is used, so loading this module (and starting the app
+# or CLI) doesn't pay for it until an email is actually sent
+if TYPE_CHECKING:
+    from sendgrid import SendGridAPIClient  # pip install sendgrid
+
+# Load environment variables
+load_dotenv()
+
+# ---------------------------------------------------------------------------
+# Config
+# ---------------------------------------------------------------------------
+GEMINI_MODEL = "google/gemini-2.0-flash-001"  # OpenRouter Gemini Flash 2.0
+DEFAULT_KEYWORDS = "artificial intelligence, machine learning, computer vision, NLP"
+MAX_RESULTS = 20  # safety cap
+SUMMARY_BATCH_SIZE = 5  # abstracts combined into one OpenRouter request
+SUMMARY_WORKERS = 8  # threads summarising in parallel in the Streamlit app
+PROMPT_VERSION = "v2"  # bump when the summary prompt changes to invalidate cached summaries
+SUMMARY_CACHE_DIR = os.path.expanduser(os.getenv("SUMMARY_CACHE_DIR", "~/.cache/arxiv_digest/summaries"))
+DEFAULT_FROM_EMAIL = "digest@artefact.ai"
+SENDGRID_MAX_PERSONALIZATIONS = 1000  # SendGrid's per-request recipient limit
+SENDGRID_PARALLEL_REQUESTS = 10  # concurrent requests when recipients span several chunks
+GMAIL_SMTP_HOST = "smtp.gmail.com"
+GMAIL_SMTP_PORT = 465
+GMAIL_PARALLEL_CONNECTIONS = 4  # SMTP connections (each reused for its share of recipients) per Gmail bulk send
+GMAIL_BATCH_SIZE = int(os.getenv("GMAIL_BATCH_SIZE", "200"))  # messages sent over one SMTP connection before it is recycled
+DEFAULT_CATEGORIES = [
+    "cs.AI",    # Artificial Intelligence
+    "cs.LG",    # Machine Learning  
+    "cs.CV",    # Computer Vision
+    "cs.CL",    # Computation and Language (NLP)
+    "cs.RO",    # Robotics
+    "cs.CR",    # Cryptography and Security
+    "cs.HC",    # Human-Computer Interaction
+    "cs.IR",    # Information Retrieval
+]
+DEFAULT_PRIORITY_SOURCES = [
+    'google', 'openai', 'microsoft', 'meta', 'deepmind', 'anthropic',
+    'stanford', 'mit', 'berkeley', 'cmu', 'oxford', 'cambridge',
+]
+
+# arXiv search API
+ARXIV_API_URL = "https://export.arxiv.org/api/query"
+ARXIV_PAGE_SIZE = 100  # results per request; larger pages are where arXiv starts stalling
+ARXIV_PAGE_DELAY = 3  # seconds between requests, as arXiv's API terms ask
+ARXIV_EMPTY_PAGE_RETRIES = 3
+_DEFAULT_CATEGORY_QUERY = "(" + " OR ".join(f"cat:{cat}" for cat in DEFAULT_CATEGORIES) + ")"
+_ATOM_NS = {
+    "atom": "http://www.w3.org/2005/Atom",
+    "opensearch": "http://a9.com/-/spec/opensearch/1.1/",
+}
+
+# arXiv OAI-PMH bulk metadata harvesting (incremental alternative to the search API)
+OAI_PMH_URL = "https://oaipmh.arxiv.org/oai"
+OAI_CACHE_PATH = os.path.expanduser(os.getenv("OAI_CACHE_PATH", "~/.cache/arxiv_digest/oai.sqlite3"))
+SEEN_DB_PATH = os.path.expanduser(os.getenv("SEEN_DB_PATH", "~/.cache/arxiv_digest/seen.sqlite3"))
+# Days a sent paper is remembered, independent of any one digest's search window
+SEEN_RETENTION_DAYS = int(os.getenv("SEEN_RETENTION_DAYS", "30"))
+
+# Email templates, compiled once at import. Callers HTML-escape values before substitution.
+DIGEST_HEADER_TMPL = Template("""
+        <div style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto;">
+            <h1 style="color: #1a73e8; text-align: center;">📚 ArXiv Daily Digest</h1>
+            <h2 style="color: #5f6368; text-align: center;">$count AI/CS Papers for $date</h2>
+            <p style="text-align: center; color: #5f6368;">Keywords: $keywords</p>
+            <hr style="border: 1px solid #e0e0e0; margin: 30px 0;">
+        """)
+PAPER_HTML_TMPL = Template("""
+    <div style="margin-bottom: 30px; padding: 20px; border-left: 4px solid #4285f4; background-color: #f8f9fa;">
+        <h3 style="margin-top: 0; color: #1a73e8;">$title</h3>
+        <p style="color: #5f6368; margin: 5px 0;"><strong>Authors:</strong> $authors</p>
+        <p style="color: #5f6368; margin: 5px 0;"><strong>Published:</strong> $published</p>
+        <div style="margin: 15px 0;">
+            $summary
+        </div>
+        <p style="margin-top: 15px;">
+            <a href="$pdf_url" style="color: #1a73e8; text-decoration: none; margin-right: 15px;">📄 PDF</a>
+            <a href="$entry_id" style="color: #1a73e8; text-decoration: none;">🔗 arXiv</a>
+        </p>
+    </div>
+    """)
+
+# Summary instructions, sent unchanged as the system message of every request so the
+# provider can reuse the cached prompt prefix; the user message carries only the
+# abstract(s). Bump PROMPT_VERSION when changing them.
+SUMMARY_SYSTEM_PROMPT = """You are an expert ML analyst. Summarise the research abstract you are given in <=120 words, 
+bullet style, focusing on contribution and why it matters. Avoid jargon and make it accessible.
+
+Format your response as concise bullet points highlighting:
+• Key contribution/innovation
+• Why it matters/potential impact
+• Technical approach (simplified)"""
+BATCH_SUMMARY_SYSTEM_PROMPT = """You are an expert ML analyst. You are given a JSON list of research abstracts, each with an id.
+For EACH abstract, write a summary in <=120 words, bullet style, focusing on contribution and
+why it matters. Avoid jargon and make it accessible.
+
+Format each summary as concise bullet points highlighting:
+• Key contribution/innovation
+• Why it matters/potential impact
+• Technical approach (simplified)
+
+Respond with ONLY a JSON object of the form
+{"summaries": [{"id": <abstract id>, "summary": "<bullet points>"}, ...]}
+containing exactly one entry per abstract id."""
+
+# OpenRouter API configuration
+OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_RATE_PER_SEC = 10  # sustained requests per second (token bucket refill)
+OPENROUTER_BURST = 8  # requests allowed back to back before throttling kicks in
+OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
+OPENROUTER_SITE_URL = os.getenv("OPENROUTER_SITE_URL", "")
+OPENROUTER_SITE_NAME = os.getenv("OPENROUTER_SITE_NAME", "ArXiv Daily Digest")
+
+SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
+GMAIL_USER = os.getenv("GMAIL_USER")
+GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD")
+FROM_EMAIL = os.getenv("FROM_EMAIL", GMAIL_USER or DEFAULT_FROM_EMAIL)
+
+# Shared HTTP session: keeps connections (and TLS sessions) alive across OpenRouter and
+# OAI-PMH calls, and retries rate limits / transient server errors with exponential
+# backoff (the first retry is immediate, then 1s, 2s, 4s), waiting for Retry-After instead
+# when 429/503 replies send it (either delay-seconds or an HTTP date).
+# The final response is still returned on exhaustion so callers report the status themselves.
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=16,
+    max_retries=Retry(
+        total=4,
+        backoff_factor=0.5,
+        respect_retry_after_header=True,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=frozenset({"GET", "POST"}),
+        raise_on_status=False,
+    ),
+))
+
+
+class TokenBucket:
+    """Thread-safe token bucket used to keep request bursts under the API rate cap."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available, then consume it."""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                time.sleep((1 - self._tokens) / self.rate)
+
+
+# Every OpenRouter request (from the app's thread pool or the CLI's workers) draws from one bucket
+_OPENROUTER_LIMITER = TokenBucket(rate=OPENROUTER_RATE_PER_SEC, capacity=OPENROUTER_BURST)
+
+# OpenRouter request headers never change within a process, so build them once
+# (requests adds Content-Type itself for json= bodies)
+_OPENROUTER_HEADERS = {
+    "Authorization": f"Bearer {OPENROUTER_API_KEY}",
+}
+if OPENROUTER_SITE_URL:
+    _OPENROUTER_HEADERS["HTTP-Referer"] = OPENROUTER_SITE_URL
+if OPENROUTER_SITE_NAME:
+    _OPENROUTER_HEADERS["X-Title"] = OPENROUTER_SITE_NAME
+
+
+def _chat_completion(system: str, prompt: str, max_tokens: int, json_mode: bool = False) -> str:
+    """Send a system + user message chat completion to OpenRouter and return the reply text (or an ❌ error string)."""
+    try:
+        data = {
+            "model": GEMINI_MODEL,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": system
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            "temperature": 0.3,
+            "max_tokens": max_tokens,
+        }
+        if json_mode:
+            data["response_format"] = {"type": "json_object"}
+        
+        _OPENROUTER_LIMITER.acquire()
+        response = _SESSION.post(
+            url=OPENROUTER_URL,
+            headers=_OPENROUTER_HEADERS,
+            json=data,
+            timeout=30
+        )
+        
+        if response.status_code != 200:
+            return f"❌ API Error {response.status_code}: {response.text}"
+        
+        response_data = response.json()
+        
+        if "error" in response_data:
+            return f"❌ OpenRouter Error: {response_data['error'].get('message', 'Unknown error')}"
+        
+        if "choices" in response_data and len(response_data["choices"]) > 0:
+            return response_data["choices"][0]["message"]["content"].strip()
+        else:
+            return "❌ No response content received from OpenRouter API"
+            
+    except requests.exceptions.Timeout:
+        return "❌ Request timeout - try again later"
+    except requests.exceptions.RequestException as e:
+        return f"❌ Network error: {str(e)}"
+    except Exception as e:
+        return f"❌ Error generating summary: {str(e)}"
+
+
+def _chat_completion_stream(system: str, prompt: str, max_tokens: int) -> Iterator[str]:
+    """Like _chat_completion, but yield the reply text chunk by chunk as OpenRouter streams it.
+    
+    Errors are yielded as a final ❌ chunk.
+    """
+    data = {
+        "model": GEMINI_MODEL,
+        "messages": [
+            {
+                "role": "system",
+                "content": system
+            },
+            {
+                "role": "user",
+                "content": prompt
+            }
+        ],
+        "temperature": 0.3,
+        "max_tokens": max_tokens,
+        "stream": True,
+    }
+    try:
+        _OPENROUTER_LIMITER.acquire()
+        with _SESSION.post(
+            url=OPENROUTER_URL,
+            headers=_OPENROUTER_HEADERS,
+            json=data,
+            timeout=30,
+            stream=True
+        ) as response:
+            if response.status_code != 200:
+                yield f"❌ API Error {response.status_code}: {response.text}"
+                return
+            
+            # Server-sent events: "data: {json}" lines, ": comment" keep-alives, "data: [DONE]" at the end
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data: "):
+                    continue
+                payload = line[len("data: "):]
+                if payload == "[DONE]":
+                    return
+                chunk = json.loads(payload)
+                if "error" in chunk:
+                    yield f"❌ OpenRouter Error: {chunk['error'].get('message', 'Unknown error')}"
+                    return
+                if chunk.get("choices"):
+                    content = chunk["choices"][0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+            # No [DONE]: the connection closed mid-reply, so what was yielded is truncated
+            yield "\n\n❌ Summary stream ended early - try again later"
+    except requests.exceptions.Timeout:
+        yield "❌ Request timeout - try again later"
+    except requests.exceptions.RequestException as e:
+        yield f"❌ Network error: {str(e)}"
+    except Exception as e:
+        yield f"❌ Error generating summary: {str(e)}"
+
+
+def _summary_cache_path(cache_dir: str, abstract: str) -> str:
+    """Cache file for an abstract; the key covers the model and prompt version too."""
+    key = hashlib.sha256((abstract + GEMINI_MODEL + PROMPT_VERSION).encode()).hexdigest()
+    return os.path.join(cache_dir, f"{key}.txt")
+
+
+def _read_cached_summary(cache_dir: str, abstract: str) -> Optional[str]:
+    """Return the cached summary for an abstract, or None on a cache miss."""
+    try:
+        with open(_summary_cache_path(cache_dir, abstract), "r", encoding="utf-8") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _write_cached_summary(cache_dir: str, abstract: str, summary: str) -> None:
+    """Store a successful summary. Error/warning messages and blank replies are never cached."""
+    if not summary.strip() or summary.startswith(("❌", "⚠️")):
+        return
+    path = _summary_cache_path(cache_dir, abstract)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(summary)
+        os.replace(tmp_path, path)  # atomic, so concurrent readers never see partial files
+    except OSError:
+        pass  # caching is best-effort
+
+
+def disk_cache(cache_dir: str = SUMMARY_CACHE_DIR):
+    """Cache an abstract -> summary function on disk so repeat runs skip the API call."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(abstract: str) -> str:
+            cached = _read_cached_summary(cache_dir, abstract)
+            if cached is not None:
+                return cached
+            summary = func(abstract)
+            _write_cached_summary(cache_dir, abstract, summary)
+            return summary
+        return wrapper
+    return decorator
+
+
+@disk_cache(cache_dir=SUMMARY_CACHE_DIR)
+def summarise_abstract(abstract: str) -> str:
+    """Call Google Gemini via OpenRouter to compress an abstract into <=120 words consultancy‑style."""
+    if not OPENROUTER_API_KEY:
+        return "⚠️ OpenRouter API key not configured. Please set OPENROUTER_API_KEY in your environment."
+    
+    return _chat_completion(SUMMARY_SYSTEM_PROMPT, f"Abstract: {abstract}", max_tokens=200)
+
+
+def stream_summary(abstract: str) -> Iterator[str]:
+    """Yield the summary of one abstract as it is generated, for incremental display.
+    
+    A cached summary is yielded in one piece. A streamed summary is cached only once it
+    completes (the stream reached [DONE]) without error and with some text.
+    """
+    cached = _read_cached_summary(SUMMARY_CACHE_DIR, abstract)
+    if cached is not None:
+        yield cached
+        return
+    if not OPENROUTER_API_KEY:
+        yield "⚠️ OpenRouter API key not configured. Please set OPENROUTER_API_KEY in your environment."
+        return
+    
+    parts = []
+    for chunk in _chat_completion_stream(SUMMARY_SYSTEM_PROMPT, f"Abstract: {abstract}", max_tokens=200):
+        parts.append(chunk)
+        yield chunk
+    if not any(part.lstrip().startswith("❌") for part in parts):
+        _write_cached_summary(SUMMARY_CACHE_DIR, abstract, "".join(parts).strip())
+
+
+def summarise_abstracts_batch(abstracts: List[str]) -> List[Optional[str]]:
+    """Summarise several abstracts in one OpenRouter request.
+    
+    Returns one summary per abstract, in order. Entries are None where the reply could not
+    be matched back to an abstract (or the whole request failed), so callers can retry
+    just those abstracts with summarise_abstract. Cached summaries are reused and only
+    the remaining abstracts are sent.
+    """
+    results: List[Optional[str]] = [_read_cached_summary(SUMMARY_CACHE_DIR, a) for a in abstracts]
+    pending = [i for i, summary in enumerate(results) if summary is None]
+    if not OPENROUTER_API_KEY or not pending:
+        return results
+    
+    # Identical abstracts (the same work listed twice) are sent once and share the summary
+    unique = list(dict.fromkeys(abstracts[i] for i in pending))
+    numbered = json.dumps([{"id": n, "abstract": abstract} for n, abstract in enumerate(unique)], ensure_ascii=False)
+    content = _chat_completion(BATCH_SUMMARY_SYSTEM_PROMPT, numbered, max_tokens=200 * len(unique), json_mode=True)
+    if content.startswith("❌"):
+        return results
+    
+    # Models occasionally wrap JSON replies in a markdown code fence
+    if content.startswith("```"):
+        content = content.strip("`").removeprefix("json").strip()
+    
+    replies: Dict[str, str] = {}
+    try:
+        for item in json.loads(content)["summaries"]:
+            n = int(item["id"])
+            summary = str(item["summary"]).strip()
+            if 0 <= n < len(unique) and summary:
+                replies[unique[n]] = summary
+                _write_cached_summary(SUMMARY_CACHE_DIR, unique[n], summary)
+    except (ValueError, KeyError, TypeError):
+        pass
+    for i in pending:
+        results[i] = replies.get(abstracts[i])
+    return results
+
+
+def summarise_abstracts(abstracts: List[str]) -> List[str]:
+    """Summarise abstracts with one batched request, then one request per abstract the reply missed."""
+    summaries = summarise_abstracts_batch(abstracts)
+    retried: Dict[str, str] = {}
+    for i, (abstract, summary) in enumerate(zip(abstracts, summaries)):
+        if summary is None:
+            if abstract not in retried:
+                retried[abstract] = summarise_abstract(abstract)
+            summaries[i] = retried[abstract]
+    return summaries
+
+
+async def summarise_abstract_async(abstract: str) -> str:
+    """Async wrapper around summarise_abstract so callers can fan out requests concurrently."""
+    return await asyncio.to_thread(summarise_abstract, abstract)
+
+
+async def summarise_abstracts_batch_async(abstracts: List[str]) -> List[Optional[str]]:
+    """Async wrapper around summarise_abstracts_batch."""
+    return await asyncio.to_thread(summarise_abstracts_batch, abstracts)
+
+
+class PaperAuthor(NamedTuple):
+    name: str
+
+
+class PaperRecord(NamedTuple):
+    """A paper from the arXiv search API or the OAI-PMH harvest (picklable, so st.cache_data can keep it).
+    
+    `published` is the timezone-aware (UTC) time of the first version. `author_line` and
+    `published_date` are the display strings, built once when the record is created.
+    """
+    entry_id: str
+    title: str
+    summary: str
+    authors: List[PaperAuthor]
+    published: datetime
+    pdf_url: str
+    categories: List[str]
+    author_line: str
+    published_date: str
+
+
+def _author_line(authors: List[PaperAuthor], limit: int = 3) -> str:
+    """The first `limit` author names, followed by "et al." if there are more."""
+    line = ", ".join([author.name for author in authors[:limit]])
+    if len(authors) > limit:
+        line += " et al."
+    return line
+
+
+def compile_source_pattern(priority_sources: Optional[List[str]] = None) -> re.Pattern:
+    """Build one regex that matches any priority source (DEFAULT_PRIORITY_SOURCES if none given)."""
+    sources = [source.lower().strip() for source in (priority_sources or DEFAULT_PRIORITY_SOURCES)]
+    return re.compile("|".join(re.escape(source) for source in sources))
+
+
+_DEFAULT_SOURCE_PATTERN = compile_source_pattern()
+
+
+def calculate_paper_score(paper: PaperRecord, priority_keywords: List[str], 
+                         source_pattern: Optional[re.Pattern] = None,
+                         now: Optional[datetime] = None) -> float:
+    """Calculate a relevance score for paper prioritization.
+    
+    `priority_keywords` must already be lowercased and `source_pattern` built with
+    compile_source_pattern; `now` is the (UTC-aware) reference time for recency.
+    select_papers prepares all three once per search.
+    """
+    score = 0.0
+    
+    # Base score from recency (newer = higher score)
+    days_old = ((now or datetime.now(timezone.utc)) - paper.published).days
+    recency_score = max(0, 7 - days_old) / 7  # Higher score for papers within 7 days
+    score += recency_score * 2
+    
+    # Keyword relevance in title (higher weight) and abstract. Plain substring checks
+    # (rather than one alternation regex) so overlapping keywords each still count.
+    title_lower = paper.title.lower()
+    abstract_lower = paper.summary.lower()
+    score += 3 * sum(keyword in title_lower for keyword in priority_keywords)
+    score += sum(keyword in abstract_lower for keyword in priority_keywords)
+    
+    # Author count as proxy for collaboration/institution backing
+    author_score = min(len(paper.authors) / 10, 1.0)  # Cap at 1.0
+    score += author_score
+    
+    # Prefer papers from priority sources (one regex scan instead of a loop over sources)
+    author_text = ' '.join([author.name for author in paper.authors]).lower()
+    if (source_pattern or _DEFAULT_SOURCE_PATTERN).search(author_text):
+        score += 2  # Higher boost for priority sources
+    
+    return score
+
+
+def _parse_atom_entry(entry: ET.Element) -> PaperRecord:
+    """Convert one arXiv API Atom <entry> into a PaperRecord."""
+    entry_id = entry.findtext("atom:id", "", _ATOM_NS)
+    pdf_url = next(
+        (link.get("href") for link in entry.iterfind("atom:link", _ATOM_NS) if link.get("title") == "pdf"),
+        entry_id.replace("/abs/", "/pdf/"),
+    )
+    authors = [PaperAuthor(author.findtext("atom:name", "", _ATOM_NS))
+               for author in entry.iterfind("atom:author", _ATOM_NS)]
+    published = datetime.fromisoformat(entry.findtext("atom:published", "", _ATOM_NS).replace("Z", "+00:00"))
+    return PaperRecord(
+        entry_id=entry_id,
+        title=" ".join(entry.findtext("atom:title", "", _ATOM_NS).split()),
+        summary=entry.findtext("atom:summary", "", _ATOM_NS).strip(),
+        authors=authors,
+        published=published,
+        pdf_url=pdf_url,
+        categories=[category.get("term") for category in entry.iterfind("atom:category", _ATOM_NS)],
+        author_line=_author_line(authors),
+        published_date=published.strftime('%Y-%m-%d'),
+    )
+
+
+def _iter_arxiv_query(query: str, max_results: int) -> Iterator[PaperRecord]:
+    """Yield arXiv API search results newest first, requesting each page only when it is reached.
+    
+    Pages go through the shared keep-alive session. arXiv sometimes returns an empty page
+    in the middle of a result set; those pages are re-requested a few times before giving up.
+    A query arXiv rejects (e.g. malformed syntax) raises RuntimeError with arXiv's message.
+    """
+    start = 0
+    empty_retries = 0
+    while start < max_results:
+        if start or empty_retries:
+            time.sleep(ARXIV_PAGE_DELAY)
+        response = _SESSION.get(ARXIV_API_URL, params={
+            "search_query": query,
+            "sortBy": "submittedDate",
+            "sortOrder": "descending",
+            "start": start,
+            "max_results": min(ARXIV_PAGE_SIZE, max_results - start),
+        }, timeout=30)
+        response.raise_for_status()
+        root = ET.fromstring(response.content)
+        total = int(root.findtext("opensearch:totalResults", "0", _ATOM_NS))
+        
+        entries = root.findall("atom:entry", _ATOM_NS)
+        if not entries:
+            if start < total and empty_retries < ARXIV_EMPTY_PAGE_RETRIES:
+                empty_retries += 1
+                continue
+            return
+        empty_retries = 0
+        
+        for entry in entries:
+            # A rejected query comes back as a single error entry (id .../api/errors#...) with no dates
+            if "/api/errors" in entry.findtext("atom:id", "", _ATOM_NS) or entry.find("atom:published", _ATOM_NS) is None:
+                raise RuntimeError(f"arXiv API error: {entry.findtext('atom:summary', '', _ATOM_NS).strip()}")
+            yield _parse_atom_entry(entry)
+        start += len(entries)
+        if start >= total:
+            return
+
+
+def iter_papers(keywords: str, max_papers: int, days_back: int = 1, 
+                categories: List[str] = None, sort_by_relevance: bool = True,
+                priority_sources: str = "", exclude_ids: Optional[Set[str]] = None) -> Iterator[PaperRecord]:
+    """Yield the papers fetch_papers would return, as early as possible.
+    
+    Without relevance sorting, papers are yielded as soon as arXiv returns them, so
+    callers can start summarising while later pages are still downloading. With
+    relevance sorting, every candidate has to be scored first. Papers whose entry_id is
+    in `exclude_ids` (e.g. ones sent in an earlier digest) are skipped.
+    """
+    # Build query with category filter (key CS categories if none specified) and keywords
+    if categories:
+        category_query = " OR ".join([f"cat:{cat}" for cat in categories])
+        query_parts = [f"({category_query})"]
+    else:
+        query_parts = [_DEFAULT_CATEGORY_QUERY]
+    
+    # Add keyword filter if provided
+    if keywords.strip():
+        keyword_list = [kw.strip() for kw in keywords.split(',') if kw.strip()]
+        keyword_query = ' OR '.join(f'"{kw}"' for kw in keyword_list)
+        query_parts.append(f"({keyword_query})")
+    
+    # Restrict to the date window on the server, so arXiv only returns in-window papers
+    now = datetime.now(timezone.utc)
+    window_start = (now - timedelta(days=days_back)).strftime("%Y%m%d%H%M")
+    window_end = (now + timedelta(days=1)).strftime("%Y%m%d%H%M")
+    query_parts.append(f"submittedDate:[{window_start} TO {window_end}]")
+    
+    query = " AND ".join(query_parts)
+    
+    # Fetch more papers than needed for filtering
+    search_limit = max_papers * 3  # Get 3x more for better filtering
+    
+    yield from select_papers(
+        _iter_arxiv_query(query, max_results=search_limit),
+        keywords=keywords,
+        max_papers=max_papers,
+        days_back=days_back,
+        sort_by_relevance=sort_by_relevance,
+        priority_sources=priority_sources,
+        exclude_ids=exclude_ids
+    )
+
+
+def _arxiv_id(entry_id: str) -> str:
+    """Versionless arXiv id of an entry_id, e.g. http://arxiv.org/abs/2401.00001v2 -> 2401.00001.
+    
+    The search API's entry_ids carry the version and OAI-PMH ones don't, so papers are
+    matched across revisions and sources by this id.
+    """
+    return re.sub(r"v\d+$", "", entry_id.strip().rsplit("/abs/", 1)[-1])
+
+
+def select_papers(candidates: Iterable, keywords: str, max_papers: int, days_back: int = 1,
+                  sort_by_relevance: bool = True, priority_sources: str = "",
+                  exclude_ids: Optional[Set[str]] = None) -> Iterator:
+    """Filter newest-first candidate papers by date and yield the top `max_papers`.
+    
+    Candidates are PaperRecords (or anything with the same attributes). Iteration stops at the first candidate older
+    than the cutoff, so no further arXiv pages are requested once the window is passed.
+    Candidates whose entry_id is in `exclude_ids` are skipped, as are repeats of a
+    candidate already taken (the API can return an entry twice when new submissions
+    shift results across pages mid-search). Ids are compared without their version, so
+    a revision of an excluded paper is excluded too.
+    """
+    exclude_ids = {_arxiv_id(entry_id) for entry_id in exclude_ids or ()}
+    now = datetime.now(timezone.utc)
+    cutoff_date = now - timedelta(days=days_back)
+    search_limit = max_papers * 3  # Consider 3x more for better filtering
+    
+    # Results arrive newest first, so without scoring they are already in final order
+    if not sort_by_relevance:
+        count = 0
+        for paper in candidates:
+            if paper.published < cutoff_date:
+                return  # everything after this is older still
+            paper_id = _arxiv_id(paper.entry_id)
+            if paper_id in exclude_ids:
+                continue
+            exclude_ids.add(paper_id)
+            yield paper
+            count += 1
+            if count >= max_papers:
+                return
+        return
+    
+    # Filter papers by submission date and calculate scores
+    papers_with_scores = []
+    priority_keywords = [kw.strip().lower() for kw in keywords.split(',') if kw.strip()] if keywords.strip() else []
+    priority_source_list = [src.strip() for src in priority_sources.split(',') if src.strip()] if priority_sources else None
+    source_pattern = compile_source_pattern(priority_source_list)
+    
+    for paper in candidates:
+        if paper.published < cutoff_date:
+            break  # everything after this is older still, so stop paging
+        paper_id = _arxiv_id(paper.entry_id)
+        if paper_id in exclude_ids:
+            continue
+        exclude_ids.add(paper_id)
+        score = calculate_paper_score(paper, priority_keywords, source_pattern, now)
+        papers_with_scores.append((paper, score))
+        
+        if len(papers_with_scores) >= search_limit:
+            break
+    
+    # Sort by relevance score
+    papers_with_scores.sort(key=lambda x: x[1], reverse=True)
+    
+    # Yield top papers
+    for paper, score in papers_with_scores[:max_papers]:
+        yield paper
+
+
+def fetch_papers(keywords: str, max_papers: int, days_back: int = 1, 
+                categories: List[str] = None, sort_by_relevance: bool = True,
+                priority_sources: str = "") -> List[PaperRecord]:
+    """Search arXiv Computer Science papers with smart filtering and ranking."""
+    return list(iter_papers(
+        keywords=keywords,
+        max_papers=max_papers,
+        days_back=days_back,
+        categories=categories,
+        sort_by_relevance=sort_by_relevance,
+        priority_sources=priority_sources
+    ))
+
+
+_OAI_NS = {"oai": "http://www.openarchives.org/OAI/2.0/", "arXiv": "http://arxiv.org/OAI/arXiv/"}
+
+
+def _open_oai_cache(path: str) -> sqlite3.Connection:
+    """Open (and create if needed) the local SQLite store of harvested records."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("""CREATE TABLE IF NOT EXISTS papers (
+        id TEXT PRIMARY KEY, created TEXT, title TEXT, abstract TEXT, authors TEXT, categories TEXT)""")
+    conn.execute("CREATE INDEX IF NOT EXISTS papers_created ON papers (created)")
+    conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+    return conn
+
+
+def _oai_request(params: dict) -> ET.Element:
+    """Issue one OAI-PMH request.
+    
+    arXiv's 503 Retry-After flow control is handled by the shared session's retry policy;
+    a 503 still left after its retries are spent is raised here.
+    """
+    response = _SESSION.get(OAI_PMH_URL, params=params, timeout=60)
+    response.raise_for_status()
+    return ET.fromstring(response.content)
+
+
+def _harvest_oai(conn: sqlite3.Connection, from_date: date) -> int:
+    """Pull every cs record changed since `from_date` into the cache, following resumption tokens.
+    
+    arXiv decides the page size itself; each page is committed as it arrives so an
+    interrupted harvest keeps what it already downloaded. Returns the number of records stored.
+    """
+    params = {"verb": "ListRecords", "metadataPrefix": "arXiv", "set": "cs", "from": from_date.isoformat()}
+    stored = 0
+    while True:
+        root = _oai_request(params)
+        error = root.find("oai:error", _OAI_NS)
+        if error is not None:
+            if error.get("code") == "noRecordsMatch":
+                return stored
+            raise RuntimeError(f"OAI-PMH error {error.get('code')}: {error.text}")
+        
+        rows = []
+        for record in root.iterfind("oai:ListRecords/oai:record", _OAI_NS):
+            meta = record.find("oai:metadata/arXiv:arXiv", _OAI_NS)
+            if meta is None:  # deleted records carry only a header
+                continue
+            authors = [
+                " ".join(filter(None, (a.findtext("arXiv:forenames", "", _OAI_NS), a.findtext("arXiv:keyname", "", _OAI_NS))))
+                for a in meta.iterfind("arXiv:authors/arXiv:author", _OAI_NS)
+            ]
+            rows.append((
+                meta.findtext("arXiv:id", "", _OAI_NS),
+                meta.findtext("arXiv:created", "", _OAI_NS),
+                " ".join(meta.findtext("arXiv:title", "", _OAI_NS).split()),
+                " ".join(meta.findtext("arXiv:abstract", "", _OAI_NS).split()),
+                json.dumps(authors),
+                meta.findtext("arXiv:categories", "", _OAI_NS),
+            ))
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO papers VALUES (?, ?, ?, ?, ?, ?)", rows)
+        stored += len(rows)
+        
+        token = root.findtext("oai:ListRecords/oai:resumptionToken", None, _OAI_NS)
+        if not token:
+            return stored
+        params = {"verb": "ListRecords", "resumptionToken": token}
+
+
+def fetch_papers_oai(since_date: date, categories: List[str] = None,
+                     cache_path: str = OAI_CACHE_PATH) -> List[PaperRecord]:
+    """Return cs papers first submitted on or after `since_date`, newest first, from the local OAI-PMH cache.
+    
+    The cache is topped up first: only records changed since the previous harvest are
+    downloaded, unless `since_date` reaches further back than anything harvested so far.
+    """
+    conn = _open_oai_cache(cache_path)
+    try:
+        meta = dict(conn.execute("SELECT key, value FROM meta"))
+        covered_from = meta.get("covered_from")
+        if covered_from and covered_from <= since_date.isoformat():
+            from_date = date.fromisoformat(meta["covered_until"])
+        else:
+            from_date = covered_from = since_date
+        
+        harvest_started = datetime.now(timezone.utc).date()
+        _harvest_oai(conn, from_date)
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ("covered_from", str(covered_from)),
+                ("covered_until", harvest_started.isoformat()),
+            ])
+        
+        wanted = set(categories) if categories else None
+        papers = []
+        for arxiv_id, created, title, abstract, authors, cats in conn.execute(
+            "SELECT * FROM papers WHERE created >= ? ORDER BY created DESC", (since_date.isoformat(),)
+        ):
+            cat_list = cats.split()
+            if wanted and wanted.isdisjoint(cat_list):
+                continue
+            author_list = [PaperAuthor(name) for name in json.loads(authors)]
+            published = datetime.fromisoformat(created).replace(tzinfo=timezone.utc)
+            papers.append(PaperRecord(
+                entry_id=f"http://arxiv.org/abs/{arxiv_id}",
+                title=title,
+                summary=abstract,
+                authors=author_list,
+                published=published,
+                pdf_url=f"http://arxiv.org/pdf/{arxiv_id}",
+                categories=cat_list,
+                author_line=_author_line(author_list),
+                published_date=published.strftime('%Y-%m-%d'),
+            ))
+        return papers
+    finally:
+        conn.close()
+
+
+def _matches_any(paper: PaperRecord, keywords: List[str]) -> bool:
+    """Whether any (lowercased) keyword occurs in the paper's title or abstract."""
+    text = f"{paper.title}\n{paper.summary}".lower()
+    return any(keyword in text for keyword in keywords)
+
+
+def iter_papers_oai(keywords: str, max_papers: int, days_back: int = 1,
+                    categories: List[str] = None, sort_by_relevance: bool = True,
+                    priority_sources: str = "", exclude_ids: Optional[Set[str]] = None) -> Iterator[PaperRecord]:
+    """Like iter_papers, but keyword-filters the local OAI-PMH harvest instead of querying the search API."""
+    since_date = (datetime.now(timezone.utc) - timedelta(days=days_back)).date()
+    papers = fetch_papers_oai(since_date, categories or DEFAULT_CATEGORIES)
+    
+    keyword_list = [kw.strip().lower() for kw in keywords.split(',') if kw.strip()]
+    if keyword_list:
+        papers = [paper for paper in papers if _matches_any(paper, keyword_list)]
+    
+    # Harvested timestamps are date-only and already cut off at since_date, so widen the
+    # window by a day to keep select_papers from dropping papers from since_date itself
+    yield from select_papers(
+        papers,
+        keywords=keywords,
+        max_papers=max_papers,
+        days_back=days_back + 1,
+        sort_by_relevance=sort_by_relevance,
+        priority_sources=priority_sources,
+        exclude_ids=exclude_ids
+    )
+
+
+def seen_scope(recipients: Iterable[str]) -> str:
+    """Seen-store scope for a recipient set, so each audience keeps its own history."""
+    return ",".join(sorted({address.strip().lower() for address in recipients}))
+
+
+def _open_seen_db(path: str) -> sqlite3.Connection:
+    """Open (and create if needed) the store of papers already sent in a digest."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path)
+    with conn:
+        # The original unscoped table can't be attributed to any recipients
+        conn.execute("DROP TABLE IF EXISTS seen")
+        conn.execute("CREATE TABLE IF NOT EXISTS sent "
+                     "(scope TEXT, entry_id TEXT, sent_at REAL, PRIMARY KEY (scope, entry_id))")
+    return conn
+
+
+def load_seen_ids(scope: str, path: str = SEEN_DB_PATH) -> Set[str]:
+    """Return the (versionless) ids of papers already sent to `scope` (see seen_scope).
+    
+    Rows older than SEEN_RETENTION_DAYS are dropped from the store first, whichever
+    scope they belong to.
+    """
+    conn = _open_seen_db(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM sent WHERE sent_at < ?", (time.time() - SEEN_RETENTION_DAYS * 86400,))
+        return {entry_id for (entry_id,) in conn.execute("SELECT entry_id FROM sent WHERE scope = ?", (scope,))}
+    finally:
+        conn.close()
+
+
+def mark_seen(entry_ids: Iterable[str], scope: str, path: str = SEEN_DB_PATH) -> None:
+    """Record papers as sent to `scope` so its later digests skip them (and their later revisions)."""
+    conn = _open_seen_db(path)
+    try:
+        with conn:
+            now = time.time()
+            conn.executemany("INSERT OR REPLACE INTO sent VALUES (?, ?, ?)",
+                             [(scope, _arxiv_id(entry_id), now) for entry_id in entry_ids])
+    finally:
+        conn.close()
+
+
+# Per-thread error list set by collect_ui_errors()
+_UI_ERRORS = threading.local()
+
+
+def _ui_error(message: str) -> None:
+    """Show an error in the Streamlit app (non-verbose callers are always the UI).
+    
+    Inside collect_ui_errors() the message is collected for the caller instead.
+    """
+    collected = getattr(_UI_ERRORS, "messages", None)
+    if collected is not None:
+        collected.append(message)
+        return
+    import streamlit as st
+    st.error(message)
+
+
+@contextlib.contextmanager
+def collect_ui_errors() -> Iterator[List[str]]:
+    """Collect the errors core would show with st.error during the block, on this thread.
+    
+    For calls made off the Streamlit script thread, where st.error is dropped; the
+    script thread shows the collected messages itself.
+    """
+    _UI_ERRORS.messages = messages = []
+    try:
+        yield messages
+    finally:
+        _UI_ERRORS.messages = None
+
+
+@functools.lru_cache(maxsize=None)
+def _smtp_ssl_context() -> ssl.SSLContext:
+    """SSL context for Gmail SMTP, built on first use and shared by later sends.
+    
+    Uses certifi's CA bundle when it is installed (works around missing system
+    certificates on macOS).
+    """
+    context = ssl.create_default_context()
+    try:
+        import certifi
+        context.load_verify_locations(certifi.where())
+        ca_bundle = certifi.where()
+    except ImportError:
+        ca_bundle = ''
+    
+    # Set SSL environment variables for this session
+    os.environ['SSL_CERT_FILE'] = ca_bundle
+    os.environ['REQUESTS_CA_BUNDLE'] = ca_bundle
+    return context
+
+
+@functools.lru_cache(maxsize=None)
+def _sendgrid_client() -> SendGridAPIClient:
+    """SendGrid client, created on first use and shared by later sends (and threads)."""
+    import urllib3
+    from sendgrid import SendGridAPIClient
+    
+    # Disable SSL warnings for certificate issues
+    urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+    return SendGridAPIClient(api_key=SENDGRID_API_KEY)
+
+
+def _build_message(from_email: str, to_email: str, subject: str, html_body: str) -> MIMEMultipart:
+    """Build an HTML email message."""
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = from_email
+    message["To"] = to_email
+    
+    # Add HTML content
+    html_part = MIMEText(html_body, "html")
+    message.attach(html_part)
+    return message
+
+
+class GmailSender:
+    """Keep one authenticated Gmail SMTP connection open across several sends.
+    
+    Usage:
+        with GmailSender(user, app_password) as sender:
+            for recipient in recipients:
+                sender.send(recipient, subject, html_body)
+    """
+    
+    def __init__(self, gmail_user: str, gmail_password: str, batch_size: int = GMAIL_BATCH_SIZE):
+        self.gmail_user = gmail_user
+        self.gmail_password = gmail_password
+        self.batch_size = batch_size
+        self._server = None
+        self._sent_on_connection = 0
+    
+    def __enter__(self) -> "GmailSender":
+        self._connect()
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def _connect(self) -> None:
+        """Open a secure connection and log in (one TLS handshake + AUTH per connection)."""
+        self.close()
+        self._server = smtplib.SMTP_SSL(GMAIL_SMTP_HOST, GMAIL_SMTP_PORT, context=_smtp_ssl_context())
+        self._server.login(self.gmail_user, self.gmail_password)
+        self._sent_on_connection = 0
+    
+    def _ensure_connection(self) -> None:
+        """Reconnect if the connection is missing, stale, or has reached its batch size."""
+        if self._server is None or self._sent_on_connection >= self.batch_size:
+            self._connect()
+            return
+        if self._sent_on_connection == 0:
+            return  # freshly connected, no need to probe
+        try:
+            status = self._server.noop()[0]
+        except (smtplib.SMTPException, OSError):
+            status = None
+        if status != 250:
+            self._connect()
+    
+    def send(self, to_email: str, subject: str, html_body: str) -> None:
+        """Send one HTML email over the shared connection. Raises on SMTP errors."""
+        message = _build_message(self.gmail_user, to_email, subject, html_body)
+        self._ensure_connection()
+        self._server.sendmail(self.gmail_user, to_email, message.as_string())
+        self._sent_on_connection += 1
+    
+    def close(self) -> None:
+        """Close the SMTP connection if open."""
+        if self._server is not None:
+            try:
+                self._server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._server = None
+
+
+def _report_gmail_error(error_msg: str, verbose: bool) -> None:
+    """Print (CLI) or show (app) a helpful message for a Gmail SMTP failure."""
+    if verbose:
+        if "authentication failed" in error_msg.lower():
+            print("❌ Gmail authentication failed")
+            print("💡 Make sure you're using an App Password, not your regular password")
+            print("💡 Enable 2FA and create App Password: https://support.google.com/accounts/answer/185833")
+        else:
+            print(f"❌ Gmail SMTP error: {error_msg}")
+    else:
+        if "authentication failed" in error_msg.lower():
+            _ui_error("Gmail authentication failed. Use App Password, not regular password.")
+        else:
+            _ui_error(f"Gmail error: {error_msg}")
+
+
+def _send_gmail_share(recipients: List[str], subject: str, html_body: str,
+                      verbose: bool) -> Tuple[Dict[str, bool], Optional[str]]:
+    """Send to several recipients through one GmailSender.
+    
+    Returns whether each recipient's email was accepted, and the error that stopped the
+    share (None if it completed). Errors are returned rather than reported, because
+    this runs on worker threads.
+    """
+    results = {recipient: False for recipient in recipients}
+    try:
+        with GmailSender(GMAIL_USER, GMAIL_APP_PASSWORD) as sender:
+            for recipient in recipients:
+                try:
+                    sender.send(recipient, subject, html_body)
+                    results[recipient] = True
+                except smtplib.SMTPRecipientsRefused as e:
+                    # Bad address - keep the connection and move on to the next recipient
+                    if verbose:
+                        print(f"❌ Recipient refused: {recipient} ({e})")
+    except Exception as e:
+        return results, str(e)
+    return results, None
+
+
+def send_email_gmail(to_email: str, subject: str, html_body: str, verbose: bool = False) -> bool:
+    """Send email using Gmail SMTP with SSL certificate fix for macOS."""
+    return send_email_gmail_bulk([to_email], subject, html_body, verbose)[to_email]
+
+
+def send_email_gmail_bulk(recipients: List[str], subject: str, html_body: str,
+                          verbose: bool = False) -> Dict[str, bool]:
+    """Send the same email to several recipients over a few long-lived Gmail SMTP connections.
+    
+    Recipients are shared out over up to GMAIL_PARALLEL_CONNECTIONS GmailSenders sending
+    in parallel; each reuses its connection (reconnecting every GMAIL_BATCH_SIZE messages
+    or when it drops) for its whole share. Returns whether each recipient's email was
+    accepted.
+    """
+    recipients = list(dict.fromkeys(recipients))  # mail each address once
+    results = {recipient: False for recipient in recipients}
+    if not GMAIL_USER or not GMAIL_APP_PASSWORD:
+        if verbose:
+            print("❌ Gmail credentials not found")
+            print("💡 Add GMAIL_USER and GMAIL_APP_PASSWORD to your .env file")
+        else:
+            _ui_error("Gmail credentials not configured")
+        return results
+    if not recipients:
+        return results
+    
+    connections = min(GMAIL_PARALLEL_CONNECTIONS, len(recipients))
+    shares = [recipients[i::connections] for i in range(connections)]
+    if len(shares) == 1:
+        outcomes = [_send_gmail_share(shares[0], subject, html_body, verbose)]
+    else:
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            outcomes = list(executor.map(
+                lambda share: _send_gmail_share(share, subject, html_body, verbose), shares
+            ))
+    
+    errors = []
+    for share_results, error in outcomes:
+        results.update(share_results)
+        if error is not None:
+            errors.append(error)
+    for error_msg in dict.fromkeys(errors):  # shares usually fail for the same reason
+        _report_gmail_error(error_msg, verbose)
+    
+    if verbose:
+        sent = sum(results.values())
+        if len(recipients) == 1:
+            if sent:
+                print("✅ Email sent successfully via Gmail!")
+        elif sent:
+            print(f"✅ Sent {sent}/{len(recipients)} emails via Gmail!")
+    return results
+
+
+def send_email(to_email: str, subject: str, html_body: str, verbose: bool = False) -> bool:
+    """Send email via Gmail (preferred) or SendGrid fallback."""
+    return send_email_bulk([to_email], subject, html_body, verbose)[to_email]
+
+
+def send_email_bulk(recipients: List[str], subject: str, html_body: str,
+                    verbose: bool = False) -> Dict[str, bool]:
+    """Send the same email to several recipients via Gmail (preferred) or SendGrid fallback.
+    
+    Gmail sends share a few long-lived SMTP connections; SendGrid sends use one request
+    per 1000 recipients. Returns whether each recipient's email was accepted.
+    """
+    recipients = list(dict.fromkeys(recipients))  # mail each address once
+    results = {recipient: False for recipient in recipients}
+    if not recipients:
+        return results
+    
+    # Try Gmail first (easier setup, no SSL issues)
+    if GMAIL_USER and GMAIL_APP_PASSWORD:
+        if verbose:
+            print("📧 Using Gmail SMTP...")
+        return send_email_gmail_bulk(recipients, subject, html_body, verbose)
+    
+    # Fallback to SendGrid
+    elif SENDGRID_API_KEY:
+        if verbose:
+            print("📧 Using SendGrid API...")
+        return send_email_sendgrid_bulk(recipients, subject, html_body, verbose)
+    
+    # No email service configured
+    else:
+        if verbose:
+            print("❌ No email service configured")
+            print("💡 Set up Gmail (easier) or SendGrid in your .env file")
+        else:
+            _ui_error("No email service configured. Set up Gmail or SendGrid in .env file.")
+        return results
+
+
+def send_email_sendgrid(to_email: str, subject: str, html_body: str, verbose: bool = False) -> bool:
+    """Send email via SendGrid with comprehensive error handling and logging."""
+    return send_email_sendgrid_bulk([to_email], subject, html_body, verbose)[to_email]
+
+
+def _send_sendgrid_request(sg: SendGridAPIClient, recipients: List[str], subject: str,
+                           html_body: str, verbose: bool) -> Tuple[bool, Optional[str]]:
+    """Send one SendGrid request carrying a separate personalization for each recipient.
+    
+    Returns whether it was accepted and, if not, the error for the app to show. Errors
+    are returned rather than shown, because this runs on worker threads.
+    """
+    from sendgrid.helpers.mail import Mail, Personalization, To
+    
+    try:
+        # Create mail object (each personalization is delivered as its own email)
+        message = Mail(
+            from_email=FROM_EMAIL,
+            subject=subject,
+            html_content=html_body
+        )
+        for recipient in recipients:
+            personalization = Personalization()
+            personalization.add_to(To(recipient))
+            message.add_personalization(personalization)
+        
+        # Send email
+        response = sg.send(message)
+        
+        # Log response details
+        if verbose:
+            print(f"📧 SendGrid Response Status: {response.status_code}")
+            if response.status_code == 202:
+                print("✅ Email sent successfully!" if len(recipients) == 1
+                      else f"✅ Email sent to {len(recipients)} recipients!")
+            else:
+                print(f"⚠️ Unexpected status code: {response.status_code}")
+                print(f"Response body: {response.body}")
+                print(f"Response headers: {response.headers}")
+        
+        # Check if successful (202 is SendGrid's success code)
+        if response.status_code == 202:
+            return True, None
+        else:
+            return False, f"SendGrid returned status code {response.status_code}"
+            
+    except Exception as e:
+        # Enhanced error handling
+        error_msg = str(e)
+        
+        # Check for common SendGrid errors
+        if "API key" in error_msg.lower() or "unauthorized" in error_msg.lower():
+            detailed_error = "Invalid SendGrid API key. Please check your SENDGRID_API_KEY."
+        elif "forbidden" in error_msg.lower():
+            detailed_error = "SendGrid API access forbidden. Check your API key permissions."
+        elif "bad request" in error_msg.lower():
+            detailed_error = "Invalid email format or content. Check sender/recipient emails."
+        elif "rate limit" in error_msg.lower():
+            detailed_error = "SendGrid rate limit exceeded. Try again later."
+        elif "quota" in error_msg.lower() or "billing" in error_msg.lower():
+            detailed_error = "SendGrid quota exceeded or billing issue. Check your account."
+        else:
+            detailed_error = f"SendGrid error: {error_msg}"
+        
+        if verbose:
+            print(f"❌ Failed to send email: {detailed_error}")
+        
+        return False, f"Failed to send email: {detailed_error}"
+
+
+def send_email_sendgrid_bulk(recipients: List[str], subject: str, html_body: str,
+                             verbose: bool = False) -> Dict[str, bool]:
+    """Send the same email to several recipients with one SendGrid request per 1000 of them.
+    
+    Requests for different chunks run in parallel. Returns whether each recipient's
+    request was accepted.
+    """
+    recipients = list(dict.fromkeys(recipients))  # mail each address once
+    results = {recipient: False for recipient in recipients}
+    if not recipients:
+        return results
+    if not SENDGRID_API_KEY:
+        if verbose:
+            print("❌ SENDGRID_API_KEY not set")
+        else:
+            _ui_error("SENDGRID_API_KEY not set")
+        return results
+    
+    sg = _sendgrid_client()
+    
+    chunks = [recipients[i:i + SENDGRID_MAX_PERSONALIZATIONS]
+              for i in range(0, len(recipients), SENDGRID_MAX_PERSONALIZATIONS)]
+    if len(chunks) == 1:
+        outcomes = [_send_sendgrid_request(sg, chunks[0], subject, html_body, verbose)]
+    else:
+        with ThreadPoolExecutor(max_workers=min(SENDGRID_PARALLEL_REQUESTS, len(chunks))) as executor:
+            outcomes = list(executor.map(
+                lambda chunk: _send_sendgrid_request(sg, chunk, subject, html_body, verbose), chunks
+            ))
+    
+    errors = []
+    for chunk, (ok, error) in zip(chunks, outcomes):
+        for recipient in chunk:
+            results[recipient] = ok
+        if error is not None:
+            errors.append(error)
+    if not verbose:
+        for error in dict.fromkeys(errors):  # chunks usually fail for the same reason
+            _ui_error(error)
+    return results
+
+
+def format_digest_header(count: int, date_str: str, keywords: str) -> str:
+    """Format the heading block that opens a digest email."""
+    return DIGEST_HEADER_TMPL.substitute(count=count, date=date_str, keywords=html.escape(keywords))
+
+
+def format_paper_html(paper: PaperRecord, summary: str) -> str:
+    """Format a single paper for HTML email."""
+    return PAPER_HTML_TMPL.substitute(
+        title=html.escape(paper.title),
+        authors=html.escape(paper.author_line),
+        published=paper.published_date,
+        summary=html.escape(summary).replace('\n', '<br>'),
+        pdf_url=html.escape(paper.pdf_url),
+        entry_id=html.escape(paper.entry_id),
+    )
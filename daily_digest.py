@@ -12,16 +12,32 @@ Example cron job (daily at 8 AM):
 """
 
 import argparse
+import asyncio
+import io
 import json
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
-from typing import List
+from typing import Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv  # pip install python-dotenv
+
+# The digest logic (and its HTTP/arXiv/SendGrid dependencies) is imported where it is
+# used, so `--help` and config errors don't pay for it.
+
+# Concurrency limits for OpenRouter summary requests
+SUMMARY_CONCURRENCY = 8  # default max requests in flight; override with OR_MAX_CONCURRENCY (the request rate is capped in core)
+
+# Email footer (the header and paper blocks come from core templates)
+DIGEST_FOOTER_HTML = """
+        <hr style="border: 1px solid #e0e0e0; margin: 30px 0;">
+        <p style="text-align: center; color: #9aa0a6; font-size: 12px;">
+            Generated by ArXiv Digest App (Automated) • Powered by Google Gemini via OpenRouter
+        </p>
+        </div>
+    """
 
-# Import functions from main app
-from streamlit_arxiv_digest import (
-    fetch_papers, summarise_abstract, send_email, format_paper_html
-)
 
 def load_config(config_path: str) -> dict:
     """Load configuration from JSON file."""
@@ -35,6 +51,117 @@ def load_config(config_path: str) -> dict:
         print(f"❌ Invalid JSON in config file: {config_path}")
         sys.exit(1)
 
+def _parse_recipients(email: str) -> List[str]:
+    """Split a comma-separated address list, dropping blanks and repeated addresses."""
+    return list(dict.fromkeys(address.strip() for address in email.split(",") if address.strip()))
+
+def _summary_concurrency() -> int:
+    """Max OpenRouter requests in flight: OR_MAX_CONCURRENCY (environment or .env), else the default."""
+    value = os.getenv("OR_MAX_CONCURRENCY")
+    if not value:
+        return SUMMARY_CONCURRENCY
+    try:
+        return max(1, int(value))
+    except ValueError:
+        print(f"⚠️ Invalid OR_MAX_CONCURRENCY={value!r}, using {SUMMARY_CONCURRENCY}")
+        return SUMMARY_CONCURRENCY
+
+async def _gather_summaries(
+    paper_stream: Iterable,
+    concurrency: int = SUMMARY_CONCURRENCY,
+    batch_size: Optional[int] = None
+) -> Tuple[list, List[str]]:
+    """Summarise papers concurrently as they arrive from `paper_stream`.
+    
+    Papers are sent in batches of `batch_size` abstracts per request, each batch starting
+    as soon as it fills up; any abstract the batched reply doesn't cover is retried on its
+    own. Papers with the same abstract as an earlier one share its summary. Returns the
+    papers and their summaries, both in stream order.
+    
+    Requests run in threads via asyncio.to_thread, so the loop's default executor is
+    sized to `concurrency` plus one thread for fetching papers; otherwise the stock
+    executor (min(32, cpus + 4) threads) would cap requests in flight below `concurrency`.
+    """
+    from core import SUMMARY_BATCH_SIZE, summarise_abstract_async, summarise_abstracts_batch_async
+    
+    batch_size = batch_size or SUMMARY_BATCH_SIZE
+    executor = ThreadPoolExecutor(max_workers=concurrency + 1)
+    asyncio.get_running_loop().set_default_executor(executor)
+    semaphore = asyncio.Semaphore(concurrency)
+    papers = []
+    completed = 0
+    total = None  # unique abstracts to summarise, known once the stream is exhausted
+    
+    # Print progress live on a terminal; under cron, collect it and write the log once
+    live = sys.stdout.isatty()
+    progress_lines = []
+    
+    def report(line: str) -> None:
+        if live:
+            print(line)
+        else:
+            progress_lines.append(line)
+    
+    async def summarise_one(paper) -> str:
+        async with semaphore:
+            return await summarise_abstract_async(paper.summary)
+    
+    async def worker(batch: list) -> List[str]:
+        nonlocal completed
+        async with semaphore:
+            summaries = await summarise_abstracts_batch_async([paper.summary for paper in batch])
+        
+        missing = [i for i, summary in enumerate(summaries) if summary is None]
+        if missing and len(batch) > 1:
+            report(f"   Batch reply incomplete - retrying {len(missing)} paper(s) individually")
+        retried = await asyncio.gather(*(summarise_one(batch[i]) for i in missing))
+        for i, summary in zip(missing, retried):
+            summaries[i] = summary
+        
+        completed += len(batch)
+        progress = f"{completed}/{total}" if total is not None else str(completed)
+        report(f"🤖 Generated summaries {progress}: {batch[-1].title[:50]}...")
+        return summaries
+    
+    try:
+        # Pull papers in a worker thread so arXiv paging doesn't block in-flight summaries
+        batches, tasks = [], []
+        batch = []
+        queued = set()
+        paper_iter = iter(paper_stream)
+        while True:
+            paper = await asyncio.to_thread(next, paper_iter, None)
+            if paper is None:
+                break
+            papers.append(paper)
+            if paper.summary in queued:
+                continue
+            queued.add(paper.summary)
+            batch.append(paper)
+            if len(batch) == batch_size:
+                batches.append(batch)
+                tasks.append(asyncio.create_task(worker(batch)))
+                batch = []
+        total = len(queued)
+        if batch:
+            batches.append(batch)
+            tasks.append(asyncio.create_task(worker(batch)))
+        
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        executor.shutdown()
+    if progress_lines:
+        sys.stdout.write("\n".join(progress_lines) + "\n")
+        sys.stdout.flush()
+    
+    summary_by_abstract = {}
+    for batch, result in zip(batches, results):
+        if isinstance(result, BaseException):
+            result = [f"❌ Error generating summary: {result}"] * len(batch)
+        for paper, summary in zip(batch, result):
+            summary_by_abstract[paper.summary] = summary
+    return papers, [summary_by_abstract[paper.summary] for paper in papers]
+
 def generate_daily_digest(
     email: str,
     keywords: str = "artificial intelligence, machine learning, computer vision, NLP",
@@ -42,38 +169,58 @@ def generate_daily_digest(
     max_papers: int = 20,
     days_back: int = 7,
     sort_by_relevance: bool = True,
-    priority_sources: str = "google, openai, anthropic, deepmind"
+    priority_sources: str = "google, openai, anthropic, deepmind",
+    use_oai: bool = False,
+    skip_seen: bool = False
 ) -> bool:
-    """Generate and send daily digest."""
+    """Generate and send daily digest.
+    
+    `email` may hold several comma-separated addresses; the digest is built once and
+    sent to all of them (each address once).
+    
+    With `use_oai`, papers come from the locally cached arXiv OAI-PMH harvest (topped up
+    incrementally each run) instead of a keyword search against the arXiv API. With
+    `skip_seen`, papers already sent to the same recipients (within the seen store's
+    retention period) are left out.
+    """
+    from core import (
+        format_digest_header, format_paper_html, iter_papers, iter_papers_oai,
+        load_seen_ids, mark_seen, seen_scope, send_email_bulk
+    )
+    
+    recipients = _parse_recipients(email)
+    if not recipients:
+        print("❌ No email address to send the digest to")
+        return False
+    scope = seen_scope(recipients)
     
     print(f"🔍 Searching for papers...")
     print(f"   Keywords: {keywords}")
     print(f"   Categories: {categories or 'All CS'}")
     print(f"   Max papers: {max_papers}")
     print(f"   Days back: {days_back}")
+    print(f"   Source: {'OAI-PMH harvest' if use_oai else 'arXiv search API'}")
     
-    # Fetch papers
-    papers = fetch_papers(
+    # Fetch papers and summarise them as they arrive (results keep the original paper order)
+    paper_stream = (iter_papers_oai if use_oai else iter_papers)(
         keywords=keywords,
         max_papers=max_papers,
         days_back=days_back,
         categories=categories,
         sort_by_relevance=sort_by_relevance,
-        priority_sources=priority_sources
+        priority_sources=priority_sources,
+        exclude_ids=load_seen_ids(scope) if skip_seen else None
     )
+    papers, summaries = asyncio.run(_gather_summaries(paper_stream, concurrency=_summary_concurrency()))
     
     if not papers:
         print("⚠️ No papers found matching criteria")
         return False
     
-    print(f"📚 Found {len(papers)} papers")
+    print(f"📚 Summarised {len(papers)} papers")
     
-    # Generate summaries
     digests = []
-    for i, paper in enumerate(papers, 1):
-        print(f"🤖 Generating summary {i}/{len(papers)}: {paper.title[:50]}...")
-        summary = summarise_abstract(paper.summary)
-        
+    for paper, summary in zip(papers, summaries):
         if summary.startswith("❌"):
             print(f"   Warning: {summary}")
             summary = "Summary generation failed - see original abstract"
@@ -81,48 +228,43 @@ def generate_daily_digest(
         digests.append((paper, summary))
     
     # Build email HTML
-    html_parts = [
-        f"""
-        <div style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto;">
-            <h1 style="color: #1a73e8; text-align: center;">📚 ArXiv Daily Digest</h1>
-            <h2 style="color: #5f6368; text-align: center;">{len(digests)} AI/CS Papers for {date.today().strftime('%B %d, %Y')}</h2>
-            <p style="text-align: center; color: #5f6368;">Keywords: {keywords}</p>
-            <hr style="border: 1px solid #e0e0e0; margin: 30px 0;">
-        """
-    ]
-    
+    today = date.today().strftime('%B %d, %Y')
+    buf = io.StringIO()
+    buf.write(format_digest_header(len(digests), today, keywords))
     for paper, summary in digests:
-        html_parts.append(format_paper_html(paper, summary))
-    
-    html_parts.append("""
-        <hr style="border: 1px solid #e0e0e0; margin: 30px 0;">
-        <p style="text-align: center; color: #9aa0a6; font-size: 12px;">
-            Generated by ArXiv Digest App (Automated) • Powered by Google Gemini via OpenRouter
-        </p>
-        </div>
-    """)
-    
-    html_body = "\n".join(html_parts)
+        buf.write("\n")
+        buf.write(format_paper_html(paper, summary))
+    buf.write("\n")
+    buf.write(DIGEST_FOOTER_HTML)
+    html_body = buf.getvalue()
     
     # Send email
-    print(f"📧 Sending digest to {email}...")
-    success = send_email(
-        to_email=email,
-        subject=f"ArXiv Daily Digest – {date.today().strftime('%B %d, %Y')}",
+    print(f"📧 Sending digest to {', '.join(recipients)}...")
+    results = send_email_bulk(
+        recipients=recipients,
+        subject=f"ArXiv Daily Digest – {today}",
         html_body=html_body,
         verbose=True  # Enable detailed logging for CLI usage
     )
+    success = bool(results) and all(results.values())
+    if len(recipients) > 1:
+        print(f"   Delivered to {sum(results.values())}/{len(recipients)} recipients")
     
     if success:
         print("✅ Digest sent successfully!")
+        if skip_seen:
+            mark_seen((paper.entry_id for paper in papers), scope)
         return True
     else:
         print("❌ Failed to send digest")
         return False
 
 def main():
+    # Load .env before the environment checks below (core, which also loads it, is imported later)
+    load_dotenv()
+    
     parser = argparse.ArgumentParser(description="Generate daily ArXiv digest")
-    parser.add_argument("--email", help="Email address to send digest to")
+    parser.add_argument("--email", help="Email address to send digest to (comma-separate several)")
     parser.add_argument("--config", help="Path to JSON config file")
     parser.add_argument("--keywords", default="artificial intelligence, machine learning, computer vision, NLP")
     parser.add_argument("--categories", help="Comma-separated list of categories (e.g., cs.AI,cs.LG)")
@@ -130,20 +272,31 @@ def main():
     parser.add_argument("--days-back", type=int, default=7, help="Days to look back for papers")
     parser.add_argument("--priority-sources", default="google, openai, anthropic, deepmind")
     parser.add_argument("--no-relevance-sort", action="store_true", help="Disable relevance sorting")
+    parser.add_argument("--skip-seen", action="store_true", help="Leave out papers already sent to these recipients")
+    parser.add_argument("--oai", action="store_true", help="Filter a local OAI-PMH harvest instead of querying the arXiv API")
     
     args = parser.parse_args()
     
     # Load config if provided
     if args.config:
         config = load_config(args.config)
-        # Use config values with command line overrides
+        # Use config values unless the option was overridden on the command line
+        defaults = {action.dest: action.default for action in parser._actions}
+        merged = {}
+        for name in ("keywords", "max_papers", "days_back", "priority_sources"):
+            value = getattr(args, name)
+            merged[name] = value if value != defaults[name] else config.get(name, value)
         email = args.email or config.get("email")
-        keywords = args.keywords if args.keywords != parser.get_default("keywords") else config.get("keywords", args.keywords)
+        if isinstance(email, list):
+            email = ",".join(email)  # config may list several recipients
+        keywords = merged["keywords"]
         categories = config.get("categories", None)
-        max_papers = args.max_papers if args.max_papers != parser.get_default("max_papers") else config.get("max_papers", args.max_papers)
-        days_back = args.days_back if args.days_back != parser.get_default("days_back") else config.get("days_back", args.days_back)
-        priority_sources = args.priority_sources if args.priority_sources != parser.get_default("priority_sources") else config.get("priority_sources", args.priority_sources)
+        max_papers = merged["max_papers"]
+        days_back = merged["days_back"]
+        priority_sources = merged["priority_sources"]
         sort_by_relevance = config.get("sort_by_relevance", not args.no_relevance_sort)
+        use_oai = args.oai or config.get("use_oai", False)
+        skip_seen = args.skip_seen or config.get("skip_seen", False)
     else:
         email = args.email
         keywords = args.keywords
@@ -152,9 +305,11 @@ def main():
         days_back = args.days_back
         priority_sources = args.priority_sources
         sort_by_relevance = not args.no_relevance_sort
+        use_oai = args.oai
+        skip_seen = args.skip_seen
     
     # Validate email is provided
-    if not email:
+    if not email or not _parse_recipients(email):
         print("❌ Email address is required")
         print("💡 Provide --email argument or set 'email' in config file")
         sys.exit(1)
@@ -177,7 +332,9 @@ def main():
         max_papers=max_papers,
         days_back=days_back,
         sort_by_relevance=sort_by_relevance,
-        priority_sources=priority_sources
+        priority_sources=priority_sources,
+        use_oai=use_oai,
+        skip_seen=skip_seen
     )
     
     sys.exit(0 if success else 1)
@@ -2,14 +2,47 @@
 """
 SSL Certificate Fix for macOS
 This script fixes SSL certificate issues on macOS Python installations.
+
+Usage:
+    python fix_certificates.py            # set cert env vars, update certifi at most weekly
+    python fix_certificates.py --verify   # also test an SSL handshake with Gmail
+    python fix_certificates.py --force    # update certifi even if checked recently
 """
 
+import argparse
+import json
 import ssl
 import os
 import subprocess
 import sys
+import time
+
+CACHE_DIR = os.path.expanduser("~/.cache/arxiv_digest")
+CERTIFI_CHECK_FILE = os.path.join(CACHE_DIR, "certifi_version")
+CERTIFI_CHECK_INTERVAL = 7 * 24 * 3600  # seconds between `pip install --upgrade certifi` runs
+
+def _certifi_checked_recently(version: str) -> bool:
+    """Return True if this certifi version was already upgraded-checked within the interval."""
+    try:
+        with open(CERTIFI_CHECK_FILE, 'r') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return False
+    return (
+        cached.get("version") == version
+        and time.time() - cached.get("checked_at", 0) < CERTIFI_CHECK_INTERVAL
+    )
 
-def fix_certificates():
+def _record_certifi_check(version: str) -> None:
+    """Remember when certifi was last upgraded-checked."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(CERTIFI_CHECK_FILE, 'w') as f:
+            json.dump({"version": version, "checked_at": time.time()}, f)
+    except OSError:
+        pass  # caching is best-effort
+
+def fix_certificates(verify: bool = False, force_update: bool = False):
     """Fix SSL certificates for Python on macOS."""
     print("🔧 Fixing SSL Certificates for macOS...")
     print("=" * 50)
@@ -22,23 +55,32 @@ def fix_certificates():
         os.environ['REQUESTS_CA_BUNDLE'] = cert_path
         print(f"✅ Set SSL_CERT_FILE to: {cert_path}")
         
-        # Method 2: Update certificates
-        print("📦 Updating certifi...")
-        subprocess.run([sys.executable, "-m", "pip", "install", "--upgrade", "certifi"], 
-                      capture_output=True, check=True)
-        print("✅ Certifi updated")
+        # Method 2: Update certificates (at most once per check interval)
+        if force_update or not _certifi_checked_recently(certifi.__version__):
+            print("📦 Updating certifi...")
+            subprocess.run([sys.executable, "-m", "pip", "install", "--upgrade", "certifi"], 
+                          capture_output=True, check=True)
+            version = subprocess.run(
+                [sys.executable, "-c", "import certifi; print(certifi.__version__)"],
+                capture_output=True, text=True, check=True
+            ).stdout.strip()
+            _record_certifi_check(version)
+            print("✅ Certifi updated")
+        else:
+            print(f"✅ Certifi {certifi.__version__} checked recently - skipping update")
         
         # Method 3: Test SSL connection
-        print("🧪 Testing SSL connection...")
-        context = ssl.create_default_context()
-        context.load_verify_locations(cert_path)
-        
-        import socket
-        with socket.create_connection(("smtp.gmail.com", 465), timeout=10) as sock:
-            with context.wrap_socket(sock, server_hostname="smtp.gmail.com") as ssock:
-                print(f"✅ SSL connection to Gmail successful!")
-                print(f"   SSL version: {ssock.version()}")
-                print(f"   Cipher: {ssock.cipher()[0]}")
+        if verify:
+            print("🧪 Testing SSL connection...")
+            context = ssl.create_default_context()
+            context.load_verify_locations(cert_path)
+            
+            import socket
+            with socket.create_connection(("smtp.gmail.com", 465), timeout=10) as sock:
+                with context.wrap_socket(sock, server_hostname="smtp.gmail.com") as ssock:
+                    print(f"✅ SSL connection to Gmail successful!")
+                    print(f"   SSL version: {ssock.version()}")
+                    print(f"   Cipher: {ssock.cipher()[0]}")
         
         print("=" * 50)
         print("🎉 SSL certificates fixed!")
@@ -51,4 +93,9 @@ def fix_certificates():
         return False
 
 if __name__ == "__main__":
-    fix_certificates()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fix SSL certificates for Python on macOS")
+    parser.add_argument("--verify", action="store_true", help="Test an SSL connection to Gmail after fixing")
+    parser.add_argument("--force", action="store_true", help="Update certifi even if it was checked recently")
+    args = parser.parse_args()
+    
+    fix_certificates(verify=args.verify, force_update=args.force)
@@ -11,60 +11,11 @@ Setup:
 Much easier than SendGrid!
 """
 
-import smtplib
-import ssl
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import os
-from dotenv import load_dotenv
+# The sender lives in core (shared with the app and daily_digest.py); this module keeps
+# the standalone Gmail test entry point and the old import path.
+from core import GMAIL_BATCH_SIZE, GmailSender, send_email_gmail, send_email_gmail_bulk
 
-load_dotenv()
-
-def send_email_gmail(to_email: str, subject: str, html_body: str, verbose: bool = False) -> bool:
-    """Send email using Gmail SMTP - much easier than SendGrid!"""
-    
-    # Get Gmail credentials from environment
-    gmail_user = os.getenv("GMAIL_USER")  # your.email@gmail.com
-    gmail_password = os.getenv("GMAIL_APP_PASSWORD")  # app password, not regular password
-    
-    if not gmail_user or not gmail_password:
-        if verbose:
-            print("❌ Gmail credentials not found")
-            print("💡 Add GMAIL_USER and GMAIL_APP_PASSWORD to your .env file")
-        return False
-    
-    try:
-        # Create message
-        message = MIMEMultipart("alternative")
-        message["Subject"] = subject
-        message["From"] = gmail_user
-        message["To"] = to_email
-        
-        # Add HTML content
-        html_part = MIMEText(html_body, "html")
-        message.attach(html_part)
-        
-        # Create secure connection and send email
-        context = ssl.create_default_context()
-        
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-            server.login(gmail_user, gmail_password)
-            server.sendmail(gmail_user, to_email, message.as_string())
-        
-        if verbose:
-            print("✅ Email sent successfully via Gmail!")
-        return True
-        
-    except Exception as e:
-        error_msg = str(e)
-        if verbose:
-            if "authentication failed" in error_msg.lower():
-                print("❌ Gmail authentication failed")
-                print("💡 Make sure you're using an App Password, not your regular password")
-                print("💡 Enable 2FA and create App Password: https://support.google.com/accounts/answer/185833")
-            else:
-                print(f"❌ Gmail SMTP error: {error_msg}")
-        return False
+__all__ = ["GMAIL_BATCH_SIZE", "GmailSender", "send_email_gmail", "send_email_gmail_bulk"]
 
 if __name__ == "__main__":
     # Test Gmail email
@@ -17,424 +17,181 @@ Run with:  streamlit run streamlit_arxiv_digest.py
 
 from __future__ import annotations
 
-import os
-import textwrap
-from datetime import date, datetime, timedelta
-from typing import List, Tuple
-
-import arxiv  # pip install arxiv
-import requests  # pip install requests
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date
+from typing import Iterator, List, Optional, Tuple, Union
+
 import streamlit as st  # pip install streamlit
-from dotenv import load_dotenv  # pip install python-dotenv
-from sendgrid import SendGridAPIClient  # pip install sendgrid
-from sendgrid.helpers.mail import Mail
 
-# Load environment variables
-load_dotenv()
+from core import (
+    DEFAULT_KEYWORDS, GEMINI_MODEL, GMAIL_APP_PASSWORD, GMAIL_USER, MAX_RESULTS,
+    OPENROUTER_API_KEY, SENDGRID_API_KEY, SUMMARY_BATCH_SIZE, SUMMARY_WORKERS, PaperRecord,
+    collect_ui_errors, fetch_papers, format_digest_header, format_paper_html, send_email, stream_summary, summarise_abstracts
+)
+
 
 # ---------------------------------------------------------------------------
-# Config
+# Streamlit UI
 # ---------------------------------------------------------------------------
-GEMINI_MODEL = "google/gemini-2.0-flash-001"  # OpenRouter Gemini Flash 2.0
-DEFAULT_KEYWORDS = "artificial intelligence, machine learning, computer vision, NLP"
-MAX_RESULTS = 20  # safety cap
-DEFAULT_FROM_EMAIL = "digest@artefact.ai"
+CATEGORY_OPTIONS = {
+    "cs.AI": "🤖 Artificial Intelligence",
+    "cs.LG": "🧠 Machine Learning", 
+    "cs.CV": "👁️ Computer Vision",
+    "cs.CL": "🗣️ Natural Language Processing",
+    "cs.RO": "🤖 Robotics",
+    "cs.CR": "🔒 Cryptography & Security",
+    "cs.HC": "👥 Human-Computer Interaction",
+    "cs.IR": "🔍 Information Retrieval",
+    "cs.NE": "🧬 Neural & Evolutionary Computing",
+    "cs.DC": "💻 Distributed Computing",
+}
+
+# Email footer (the header and paper blocks come from core templates)
+DIGEST_FOOTER_HTML = """
+                <hr style="border: 1px solid #e0e0e0; margin: 30px 0;">
+                <p style="text-align: center; color: #9aa0a6; font-size: 12px;">
+                    Generated by ArXiv Digest App • Powered by Google Gemini via OpenRouter
+                </p>
+                </div>
+            """
+
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def fetch_papers_cached(keywords: str, max_papers: int, days_back: int, categories: Optional[List[str]],
+                        sort_by_relevance: bool, priority_sources: str) -> List[PaperRecord]:
+    """fetch_papers memoised per query for an hour."""
+    return fetch_papers(
+        keywords=keywords,
+        max_papers=max_papers,
+        days_back=days_back,
+        categories=categories,
+        sort_by_relevance=sort_by_relevance,
+        priority_sources=priority_sources
+    )
 
-# OpenRouter API configuration
-OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_SITE_URL = os.getenv("OPENROUTER_SITE_URL", "")
-OPENROUTER_SITE_NAME = os.getenv("OPENROUTER_SITE_NAME", "ArXiv Daily Digest")
 
-SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
-GMAIL_USER = os.getenv("GMAIL_USER")
-GMAIL_APP_PASSWORD = os.getenv("GMAIL_APP_PASSWORD")
-FROM_EMAIL = os.getenv("FROM_EMAIL", GMAIL_USER or DEFAULT_FROM_EMAIL)
+@st.cache_resource
+def email_executor() -> ThreadPoolExecutor:
+    """Thread pool for sending digest emails without blocking the page, shared across reruns."""
+    return ThreadPoolExecutor(max_workers=2)
 
 
-def summarise_abstract(abstract: str) -> str:
-    """Call Google Gemini via OpenRouter to compress an abstract into <=120 words consultancy‑style."""
-    if not OPENROUTER_API_KEY:
-        return "⚠️ OpenRouter API key not configured. Please set OPENROUTER_API_KEY in your environment."
+def send_digest_email(to_email: str, subject: str, html_body: str) -> Tuple[bool, List[str]]:
+    """Send the digest from an email_executor() thread.
     
-    try:
-        prompt = f"""You are an expert ML analyst. Summarise the following research abstract in <=120 words, 
-        bullet style, focusing on contribution and why it matters. Avoid jargon and make it accessible.
-
-        Abstract: {abstract}
-
-        Format your response as concise bullet points highlighting:
-        • Key contribution/innovation
-        • Why it matters/potential impact
-        • Technical approach (simplified)"""
-        
-        headers = {
-            "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-            "Content-Type": "application/json",
-        }
-        
-        # Add optional headers if configured
-        if OPENROUTER_SITE_URL:
-            headers["HTTP-Referer"] = OPENROUTER_SITE_URL
-        if OPENROUTER_SITE_NAME:
-            headers["X-Title"] = OPENROUTER_SITE_NAME
-        
-        data = {
-            "model": GEMINI_MODEL,
-            "messages": [
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            "temperature": 0.3,
-            "max_tokens": 200,
-        }
-        
-        response = requests.post(
-            url="https://openrouter.ai/api/v1/chat/completions",
-            headers=headers,
-            data=json.dumps(data),
-            timeout=30
-        )
-        
-        if response.status_code != 200:
-            return f"❌ API Error {response.status_code}: {response.text}"
-        
-        response_data = response.json()
-        
-        if "error" in response_data:
-            return f"❌ OpenRouter Error: {response_data['error'].get('message', 'Unknown error')}"
-        
-        if "choices" in response_data and len(response_data["choices"]) > 0:
-            return response_data["choices"][0]["message"]["content"].strip()
-        else:
-            return "❌ No response content received from OpenRouter API"
-            
-    except requests.exceptions.Timeout:
-        return "❌ Request timeout - try again later"
-    except requests.exceptions.RequestException as e:
-        return f"❌ Network error: {str(e)}"
-    except Exception as e:
-        return f"❌ Error generating summary: {str(e)}"
+    st.error calls are dropped off the script thread, so the errors send_email would
+    show are returned for the script to display instead.
+    """
+    with collect_ui_errors() as errors:
+        success = send_email(to_email=to_email, subject=subject, html_body=html_body)
+    return success, errors
 
 
-def calculate_paper_score(paper: arxiv.Result, priority_keywords: List[str], 
-                         priority_sources: List[str] = None) -> float:
-    """Calculate a relevance score for paper prioritization."""
-    score = 0.0
-    
-    # Base score from recency (newer = higher score)
-    days_old = (datetime.now().replace(tzinfo=None) - paper.published.replace(tzinfo=None)).days
-    recency_score = max(0, 7 - days_old) / 7  # Higher score for papers within 7 days
-    score += recency_score * 2
-    
-    # Keyword relevance in title (higher weight)
-    title_lower = paper.title.lower()
-    for keyword in priority_keywords:
-        if keyword.lower() in title_lower:
-            score += 3
-    
-    # Keyword relevance in abstract
-    abstract_lower = paper.summary.lower()
-    for keyword in priority_keywords:
-        if keyword.lower() in abstract_lower:
-            score += 1
-    
-    # Author count as proxy for collaboration/institution backing
-    author_score = min(len(paper.authors) / 10, 1.0)  # Cap at 1.0
-    score += author_score
+@st.fragment(run_every=1)
+def email_status() -> None:
+    """Report the background digest email send, rechecking every second until it is done.
     
-    # Prefer papers from priority sources
-    if priority_sources:
-        sources = priority_sources
+    Runs as a fragment, so the page stays usable while the email is being sent. Once the
+    send finishes its outcome is kept in session state and the whole app reruns, which
+    shows it with show_email_outcome and stops this fragment's polling.
+    """
+    future = st.session_state.get("email_future")
+    if future is None:
+        return
+    if not future.done():
+        st.info("📧 Sending email digest...")
+        return
+    try:
+        st.session_state["email_outcome"] = future.result()
+    except Exception as e:
+        st.session_state["email_outcome"] = (False, [f"Error sending email: {str(e)}"])
+    del st.session_state["email_future"]
+    st.rerun(scope="app")
+
+
+def show_email_outcome() -> None:
+    """Show how the last background digest email send went, if one has finished."""
+    outcome = st.session_state.get("email_outcome")
+    if outcome is None:
+        return
+    success, errors = outcome
+    if success:
+        st.success("📧 Digest sent successfully! Check your inbox.")
     else:
-        sources = ['google', 'openai', 'microsoft', 'meta', 'deepmind', 'anthropic', 
-                  'stanford', 'mit', 'berkeley', 'cmu', 'oxford', 'cambridge']
-    
-    author_text = ' '.join([author.name.lower() for author in paper.authors])
-    for source in sources:
-        if source.lower().strip() in author_text:
-            score += 2  # Higher boost for priority sources
-            break
-    
-    return score
+        details = "\n\n".join(errors) or "Please check your SendGrid configuration."
+        st.error(f"❌ Failed to send email. {details}")
 
 
-def fetch_papers(keywords: str, max_papers: int, days_back: int = 1, 
-                categories: List[str] = None, sort_by_relevance: bool = True,
-                priority_sources: str = "") -> List[arxiv.Result]:
-    """Search arXiv Computer Science papers with smart filtering and ranking."""
-    # Create date filter for recent papers
-    cutoff_date = datetime.now() - timedelta(days=days_back)
-    
-    # Default to key CS categories if none specified
-    if not categories:
-        categories = [
-            "cs.AI",    # Artificial Intelligence
-            "cs.LG",    # Machine Learning  
-            "cs.CV",    # Computer Vision
-            "cs.CL",    # Computation and Language (NLP)
-            "cs.RO",    # Robotics
-            "cs.CR",    # Cryptography and Security
-            "cs.HC",    # Human-Computer Interaction
-            "cs.IR",    # Information Retrieval
-        ]
-    
-    # Build query with category filter and keywords
-    query_parts = []
-    
-    # Add category filter
-    if categories:
-        category_query = " OR ".join([f"cat:{cat}" for cat in categories])
-        query_parts.append(f"({category_query})")
-    else:
-        query_parts.append("cat:cs.*")
-    
-    # Add keyword filter if provided
-    if keywords.strip():
-        keyword_list = [kw.strip() for kw in keywords.split(',') if kw.strip()]
-        keyword_query = ' OR '.join(f'"{kw}"' for kw in keyword_list)
-        query_parts.append(f"({keyword_query})")
-    
-    query = " AND ".join(query_parts)
+@st.fragment
+def export_config(selected_categories: List[str], sort_by_relevance: bool, priority_sources: str) -> None:
+    """Sidebar button that shows the current settings as an automation config.
     
-    # Fetch more papers than needed for filtering
-    search_limit = max_papers * 3  # Get 3x more for better filtering
-    
-    search = arxiv.Search(
-        query=query,
-        max_results=search_limit,
-        sort_by=arxiv.SortCriterion.SubmittedDate,
-        sort_order=arxiv.SortOrder.Descending,
-    )
-    
-    # Filter papers by submission date and calculate scores
-    papers_with_scores = []
-    priority_keywords = [kw.strip() for kw in keywords.split(',') if kw.strip()] if keywords.strip() else []
-    priority_source_list = [src.strip() for src in priority_sources.split(',') if src.strip()] if priority_sources else None
-    
-    for paper in search.results():
-        if paper.published.replace(tzinfo=None) >= cutoff_date:
-            if sort_by_relevance:
-                score = calculate_paper_score(paper, priority_keywords, priority_source_list)
-                papers_with_scores.append((paper, score))
-            else:
-                papers_with_scores.append((paper, 0))
+    Runs as a fragment, so clicking it only reruns this block. The main form's values
+    are read from its widgets' session state keys.
+    """
+    form = st.session_state
+    if st.button("📋 Export Config for Automation", help="Generate command for daily automation"):
+        config = {
+            "keywords": form.get("keywords", DEFAULT_KEYWORDS),
+            "categories": selected_categories,
+            "max_papers": form.get("max_papers", 5),
+            "days_back": form.get("days_back", 1),
+            "sort_by_relevance": sort_by_relevance,
+            "priority_sources": priority_sources,
+            "email": form.get("email", "")
+        }
         
-        if len(papers_with_scores) >= search_limit:
-            break
-    
-    # Sort by relevance score if enabled
-    if sort_by_relevance:
-        papers_with_scores.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return top papers
-    return [paper for paper, score in papers_with_scores[:max_papers]]
-
+        st.code(f"""
+# Daily ArXiv Digest Automation Config
+# Save this as config.json and use with automation script
 
-def send_email_gmail(to_email: str, subject: str, html_body: str, verbose: bool = False) -> bool:
-    """Send email using Gmail SMTP with SSL certificate fix for macOS."""
-    import smtplib
-    import ssl
-    import os
-    from email.mime.text import MIMEText
-    from email.mime.multipart import MIMEMultipart
-    
-    if not GMAIL_USER or not GMAIL_APP_PASSWORD:
-        if verbose:
-            print("❌ Gmail credentials not found")
-            print("💡 Add GMAIL_USER and GMAIL_APP_PASSWORD to your .env file")
-        else:
-            st.error("Gmail credentials not configured")
-        return False
-    
-    try:
-        # Create message
-        message = MIMEMultipart("alternative")
-        message["Subject"] = subject
-        message["From"] = GMAIL_USER
-        message["To"] = to_email
-        
-        # Add HTML content
-        html_part = MIMEText(html_body, "html")
-        message.attach(html_part)
-        
-        # Create SSL context with certificate fix for macOS
-        context = ssl.create_default_context()
-        
-        # Try to use certifi certificates
-        try:
-            import certifi
-            context.load_verify_locations(certifi.where())
-            if verbose:
-                print(f"📋 Using certifi certificates: {certifi.where()}")
-        except ImportError:
-            if verbose:
-                print("⚠️ Certifi not available, using default certificates")
-        
-        # Set SSL environment variables for this session
-        os.environ['SSL_CERT_FILE'] = certifi.where() if 'certifi' in locals() else ''
-        os.environ['REQUESTS_CA_BUNDLE'] = certifi.where() if 'certifi' in locals() else ''
-        
-        with smtplib.SMTP_SSL("smtp.gmail.com", 465, context=context) as server:
-            server.login(GMAIL_USER, GMAIL_APP_PASSWORD)
-            server.sendmail(GMAIL_USER, to_email, message.as_string())
-        
-        if verbose:
-            print("✅ Email sent successfully via Gmail!")
-        return True
+{json.dumps(config, indent=2)}
+        """, language="json")
         
-    except Exception as e:
-        error_msg = str(e)
-        if verbose:
-            if "authentication failed" in error_msg.lower():
-                print("❌ Gmail authentication failed")
-                print("💡 Make sure you're using an App Password, not your regular password")
-            else:
-                print(f"❌ Gmail SMTP error: {error_msg}")
-        else:
-            if "authentication failed" in error_msg.lower():
-                st.error("Gmail authentication failed. Use App Password, not regular password.")
-            else:
-                st.error(f"Gmail error: {error_msg}")
-        return False
-
+        # Generate automation command
+        automation_cmd = f"""
+# Example cron job (runs daily at 8 AM):
+# 0 8 * * * cd /path/to/arxiv-digest && python daily_digest.py
 
-def send_email(to_email: str, subject: str, html_body: str, verbose: bool = False) -> bool:
-    """Send email via Gmail (preferred) or SendGrid fallback."""
-    
-    # Try Gmail first (easier setup, no SSL issues)
-    if GMAIL_USER and GMAIL_APP_PASSWORD:
-        if verbose:
-            print("📧 Using Gmail SMTP...")
-        return send_email_gmail(to_email, subject, html_body, verbose)
-    
-    # Fallback to SendGrid
-    elif SENDGRID_API_KEY:
-        if verbose:
-            print("📧 Using SendGrid API...")
-        return send_email_sendgrid(to_email, subject, html_body, verbose)
-    
-    # No email service configured
-    else:
-        if verbose:
-            print("❌ No email service configured")
-            print("💡 Set up Gmail (easier) or SendGrid in your .env file")
-        else:
-            st.error("No email service configured. Set up Gmail or SendGrid in .env file.")
-        return False
+python daily_digest.py \\
+  --keywords "{config['keywords']}" \\
+  --categories "{','.join(config['categories'])}" \\
+  --max-papers {config['max_papers']} \\
+  --email "{config['email']}" \\
+  --priority-sources "{config['priority_sources']}"
+        """
+        
+        st.code(automation_cmd, language="bash")
 
 
-def send_email_sendgrid(to_email: str, subject: str, html_body: str, verbose: bool = False) -> bool:
-    """Send email via SendGrid with comprehensive error handling and logging."""
-    if not SENDGRID_API_KEY:
-        if verbose:
-            print("❌ SENDGRID_API_KEY not set")
-        else:
-            st.error("SENDGRID_API_KEY not set")
-        return False
+def render_paper(paper, summary: Union[str, Iterator[str]]) -> str:
+    """Show one paper and its summary as an expander.
     
-    try:
-        # Create SendGrid client with SSL handling for macOS certificate issues
-        import ssl
-        import urllib3
-        
-        # Disable SSL warnings for certificate issues
-        urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
-        
-        # Try to create a permissive SSL context for macOS certificate issues
-        try:
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-        except Exception:
-            pass  # Fall back to default behavior
-        
-        sg = SendGridAPIClient(api_key=SENDGRID_API_KEY)
-        
-        # Create mail object
-        message = Mail(
-            from_email=FROM_EMAIL,
-            to_emails=to_email,
-            subject=subject,
-            html_content=html_body
-        )
-        
-        # Send email
-        response = sg.send(message)
+    `summary` may be a stream of text chunks, which is shown as it arrives. Returns the
+    full summary text.
+    """
+    with st.expander(f"📄 {paper.title}", expanded=True):
+        col1, col2 = st.columns([3, 1])
         
-        # Log response details
-        if verbose:
-            print(f"📧 SendGrid Response Status: {response.status_code}")
-            if response.status_code == 202:
-                print("✅ Email sent successfully!")
+        with col1:
+            st.markdown("**🤖 AI Summary:**")
+            if isinstance(summary, str):
+                st.markdown(summary)
             else:
-                print(f"⚠️ Unexpected status code: {response.status_code}")
-                print(f"Response body: {response.body}")
-                print(f"Response headers: {response.headers}")
-        
-        # Check if successful (202 is SendGrid's success code)
-        if response.status_code == 202:
-            return True
-        else:
-            if not verbose:
-                st.error(f"SendGrid returned status code {response.status_code}")
-            return False
+                summary = st.write_stream(summary)
             
-    except Exception as e:
-        # Enhanced error handling
-        error_msg = str(e)
+            # Show authors and date
+            st.caption(f"**Authors:** {paper.author_line}")
+            st.caption(f"**Published:** {paper.published_date}")
         
-        # Check for common SendGrid errors
-        if "API key" in error_msg.lower() or "unauthorized" in error_msg.lower():
-            detailed_error = "Invalid SendGrid API key. Please check your SENDGRID_API_KEY."
-        elif "forbidden" in error_msg.lower():
-            detailed_error = "SendGrid API access forbidden. Check your API key permissions."
-        elif "bad request" in error_msg.lower():
-            detailed_error = "Invalid email format or content. Check sender/recipient emails."
-        elif "rate limit" in error_msg.lower():
-            detailed_error = "SendGrid rate limit exceeded. Try again later."
-        elif "quota" in error_msg.lower() or "billing" in error_msg.lower():
-            detailed_error = "SendGrid quota exceeded or billing issue. Check your account."
-        else:
-            detailed_error = f"SendGrid error: {error_msg}"
-        
-        if verbose:
-            print(f"❌ Failed to send email: {detailed_error}")
-        else:
-            st.error(f"Failed to send email: {detailed_error}")
-        
-        return False
+        with col2:
+            st.markdown("**🔗 Links:**")
+            st.markdown(f"[📄 PDF]({paper.pdf_url})")
+            st.markdown(f"[🔗 arXiv]({paper.entry_id})")
+    return summary
 
 
-def format_paper_html(paper: arxiv.Result, summary: str) -> str:
-    """Format a single paper for HTML email."""
-    authors = ", ".join([author.name for author in paper.authors[:3]])
-    if len(paper.authors) > 3:
-        authors += " et al."
-    
-    formatted_summary = summary.replace('\n', '<br>')
-    
-    return f"""
-    <div style="margin-bottom: 30px; padding: 20px; border-left: 4px solid #4285f4; background-color: #f8f9fa;">
-        <h3 style="margin-top: 0; color: #1a73e8;">{paper.title}</h3>
-        <p style="color: #5f6368; margin: 5px 0;"><strong>Authors:</strong> {authors}</p>
-        <p style="color: #5f6368; margin: 5px 0;"><strong>Published:</strong> {paper.published.strftime('%Y-%m-%d')}</p>
-        <div style="margin: 15px 0;">
-            {formatted_summary}
-        </div>
-        <p style="margin-top: 15px;">
-            <a href="{paper.pdf_url}" style="color: #1a73e8; text-decoration: none; margin-right: 15px;">📄 PDF</a>
-            <a href="{paper.entry_id}" style="color: #1a73e8; text-decoration: none;">🔗 arXiv</a>
-        </p>
-    </div>
-    """
-
-
-# ---------------------------------------------------------------------------
-# Streamlit UI
-# ---------------------------------------------------------------------------
 st.set_page_config(
     page_title="ArXiv Daily Digest", 
     page_icon="📚",
@@ -520,24 +277,11 @@ with st.sidebar:
     
     # Category selection
     st.subheader("📚 ArXiv Categories")
-    category_options = {
-        "cs.AI": "🤖 Artificial Intelligence",
-        "cs.LG": "🧠 Machine Learning", 
-        "cs.CV": "👁️ Computer Vision",
-        "cs.CL": "🗣️ Natural Language Processing",
-        "cs.RO": "🤖 Robotics",
-        "cs.CR": "🔒 Cryptography & Security",
-        "cs.HC": "👥 Human-Computer Interaction",
-        "cs.IR": "🔍 Information Retrieval",
-        "cs.NE": "🧬 Neural & Evolutionary Computing",
-        "cs.DC": "💻 Distributed Computing",
-    }
-    
     selected_categories = st.multiselect(
         "Select categories to monitor:",
-        options=list(category_options.keys()),
+        options=list(CATEGORY_OPTIONS.keys()),
         default=["cs.AI", "cs.LG", "cs.CV", "cs.CL"],
-        format_func=lambda x: category_options[x],
+        format_func=CATEGORY_OPTIONS.__getitem__,
         help="Choose which ArXiv categories to include in your daily digest"
     )
     
@@ -564,38 +308,7 @@ with st.sidebar:
     st.info("💡 **Pro Tip**: For daily automation, save these settings and run via cron job or GitHub Actions")
     
     # Export configuration
-    if st.button("📋 Export Config for Automation", help="Generate command for daily automation"):
-        config = {
-            "keywords": keywords if 'keywords' in locals() else DEFAULT_KEYWORDS,
-            "categories": selected_categories,
-            "max_papers": max_papers if 'max_papers' in locals() else 5,
-            "days_back": days_back if 'days_back' in locals() else 1,
-            "sort_by_relevance": sort_by_relevance,
-            "priority_sources": priority_sources,
-            "email": email if 'email' in locals() else ""
-        }
-        
-        st.code(f"""
-# Daily ArXiv Digest Automation Config
-# Save this as config.json and use with automation script
-
-{json.dumps(config, indent=2)}
-        """, language="json")
-        
-        # Generate automation command
-        automation_cmd = f"""
-# Example cron job (runs daily at 8 AM):
-# 0 8 * * * cd /path/to/arxiv-digest && python daily_digest.py
-
-python daily_digest.py \\
-  --keywords "{config['keywords']}" \\
-  --categories "{','.join(config['categories'])}" \\
-  --max-papers {config['max_papers']} \\
-  --email "{config['email']}" \\
-  --priority-sources "{config['priority_sources']}"
-        """
-        
-        st.code(automation_cmd, language="bash")
+    export_config(selected_categories, sort_by_relevance, priority_sources)
 
 # Main form
 col1, col2 = st.columns([2, 1])
@@ -604,13 +317,15 @@ with col1:
     email = st.text_input(
         "📧 Your email address", 
         placeholder="you@company.com",
-        help="Where to send the digest"
+        help="Where to send the digest",
+        key="email"
     )
     
     keywords = st.text_input(
         "🔍 Keywords to watch", 
         value=DEFAULT_KEYWORDS,
-        help="Comma-separated keywords for paper search"
+        help="Comma-separated keywords for paper search",
+        key="keywords"
     )
 
 with col2:
@@ -619,7 +334,8 @@ with col2:
         min_value=1, 
         max_value=MAX_RESULTS, 
         value=5,
-        help="Maximum papers to include"
+        help="Maximum papers to include",
+        key="max_papers"
     )
     
     days_back = st.selectbox(
@@ -627,13 +343,18 @@ with col2:
         options=[1, 2, 3, 7],
         index=0,
         format_func=lambda x: f"Last {x} day{'s' if x > 1 else ''}",
-        help="How far back to search for papers"
+        help="How far back to search for papers",
+        key="days_back"
     )
 
 # Generate button
 generate = st.button("🚀 Generate & Send Digest", type="primary", use_container_width=True)
 
 if generate:
+    # A new digest replaces the last one and its email outcome
+    for state_key in ("last_digest", "email_outcome"):
+        st.session_state.pop(state_key, None)
+    
     if not email:
         st.error("Please enter a valid email address.")
         st.stop()
@@ -644,7 +365,7 @@ if generate:
 
     # Search for papers with smart filtering
     with st.spinner("🔎 Searching arXiv for recent papers..."):
-        papers = fetch_papers(
+        papers = fetch_papers_cached(
             keywords=keywords, 
             max_papers=max_papers, 
             days_back=days_back,
@@ -662,110 +383,108 @@ if generate:
     # Generate summaries and display
     st.header(f"📋 Papers Summary ({len(papers)} papers)")
     
-    digests = []
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    for i, paper in enumerate(papers):
-        # Update progress
-        progress = (i + 1) / len(papers)
-        progress_bar.progress(progress)
-        status_text.text(f"Processing paper {i + 1}/{len(papers)}: {paper.title[:50]}...")
-        
-        # Display paper
-        with st.expander(f"📄 {paper.title}", expanded=True):
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                # Generate summary
-                with st.spinner("Generating AI summary..."):
-                    summary = summarise_abstract(paper.summary)
-                
-                st.markdown("**🤖 AI Summary:**")
-                st.markdown(summary)
-                
-                # Show authors and date
-                authors = ", ".join([author.name for author in paper.authors[:3]])
-                if len(paper.authors) > 3:
-                    authors += " et al."
-                st.caption(f"**Authors:** {authors}")
-                st.caption(f"**Published:** {paper.published.strftime('%Y-%m-%d')}")
-            
-            with col2:
-                st.markdown("**🔗 Links:**")
-                st.markdown(f"[📄 PDF]({paper.pdf_url})")
-                st.markdown(f"[🔗 arXiv]({paper.entry_id})")
-        
-        digests.append((paper, summary))
+    # Stream the top-ranked paper's summary straight onto the page while the rest are
+    # summarised in batches on a thread pool; each of those is rendered into its slot
+    # (kept in ranked order) as soon as its batch replies
+    placeholders = [st.empty() for _ in papers]
+    summaries = [None] * len(papers)
+    
+    def show_summary(indices: List[int], summary: str) -> None:
+        """Render one summary into the slots of the given papers."""
+        for idx in indices:
+            summaries[idx] = summary
+            with placeholders[idx].container():
+                render_paper(papers[idx], summary)
+    
+    # Papers sharing an abstract (e.g. the same work listed twice) are summarised once
+    papers_by_abstract = {}
+    for idx, paper in enumerate(papers):
+        papers_by_abstract.setdefault(paper.summary, []).append(idx)
+    abstracts = list(papers_by_abstract)  # abstracts[0] is the top-ranked paper's
+    batches = [abstracts[i:i + SUMMARY_BATCH_SIZE] for i in range(1, len(abstracts), SUMMARY_BATCH_SIZE)]
+    
+    with ThreadPoolExecutor(max_workers=max(1, min(SUMMARY_WORKERS, len(batches)))) as executor:
+        futures = {executor.submit(summarise_abstracts, batch): batch for batch in batches}
+        with placeholders[0].container():
+            summaries[0] = render_paper(papers[0], stream_summary(abstracts[0]))
+        show_summary(papers_by_abstract[abstracts[0]][1:], summaries[0])
+        done = len(papers_by_abstract[abstracts[0]])
+        progress_bar.progress(done / len(papers))
+        status_text.text(f"Summarised paper {done}/{len(papers)}: {papers[0].title[:50]}...")
+        
+        for future in as_completed(futures):
+            batch = futures[future]
+            for abstract, summary in zip(batch, future.result()):
+                show_summary(papers_by_abstract[abstract], summary)
+                done += len(papers_by_abstract[abstract])
+            progress_bar.progress(done / len(papers))
+            status_text.text(f"Summarised paper {done}/{len(papers)}: {papers[papers_by_abstract[batch[-1]][0]].title[:50]}...")
+    
+    digests = list(zip(papers, summaries))
     
     # Clear progress indicators
     progress_bar.empty()
     status_text.empty()
     
-    # Send email if configured
+    # Build the email HTML and the downloadable text in one pass over the digest
+    today = date.today().strftime('%B %d, %Y')
+    html_parts = [format_digest_header(len(digests), today, keywords)]
+    text_parts = [
+        f"ArXiv Digest - {today}\n",
+        f"Keywords: {keywords}\n",
+        "=" * 60 + "\n\n",
+    ]
+    for paper, summary in digests:
+        html_parts.append(format_paper_html(paper, summary))
+        text_parts.append(
+            f"Title: {paper.title}\n"
+            f"Authors: {paper.author_line}\n"
+            f"Published: {paper.published_date}\n"
+            f"PDF: {paper.pdf_url}\n"
+            f"arXiv: {paper.entry_id}\n\n"
+            f"Summary:\n{summary}\n\n"
+            + "-" * 60 + "\n\n"
+        )
+    html_parts.append(DIGEST_FOOTER_HTML)
+    st.session_state["last_digest"] = (digests, "".join(text_parts))
+    
+    # Send email if configured. The send runs in the background and email_status
+    # reports it below, so the script finishes without waiting for it.
     if SENDGRID_API_KEY and email:
-        with st.spinner("📧 Sending email digest..."):
-            # Build email HTML
-            html_parts = [
-                f"""
-                <div style="font-family: Arial, sans-serif; max-width: 800px; margin: 0 auto;">
-                    <h1 style="color: #1a73e8; text-align: center;">📚 ArXiv Daily Digest</h1>
-                    <h2 style="color: #5f6368; text-align: center;">{len(digests)} AI/CS Papers for {date.today().strftime('%B %d, %Y')}</h2>
-                    <p style="text-align: center; color: #5f6368;">Keywords: {keywords}</p>
-                    <hr style="border: 1px solid #e0e0e0; margin: 30px 0;">
-                """
-            ]
-            
-            for paper, summary in digests:
-                html_parts.append(format_paper_html(paper, summary))
-            
-            html_parts.append("""
-                <hr style="border: 1px solid #e0e0e0; margin: 30px 0;">
-                <p style="text-align: center; color: #9aa0a6; font-size: 12px;">
-                    Generated by ArXiv Digest App • Powered by Google Gemini via OpenRouter
-                </p>
-                </div>
-            """)
-            
-            html_body = "\n".join(html_parts)
-            
-            success = send_email(
-                to_email=email,
-                subject=f"ArXiv Digest – {date.today().strftime('%B %d, %Y')}",
-                html_body=html_body,
-            )
-            
-            if success:
-                st.success("📧 Digest sent successfully! Check your inbox.")
-            else:
-                st.error("❌ Failed to send email. Please check your SendGrid configuration.")
+        st.session_state["email_future"] = email_executor().submit(
+            send_digest_email,
+            to_email=email,
+            subject=f"ArXiv Digest – {today}",
+            html_body="\n".join(html_parts),
+        )
     else:
         if not SENDGRID_API_KEY:
             st.info("📧 Email not sent - SendGrid not configured")
         else:
             st.info("📧 Ready to send - click the button above to include email delivery")
-
+elif "last_digest" in st.session_state:
+    # Other reruns (e.g. the one email_status triggers when the send finishes) show the last digest again
+    digests, _ = st.session_state["last_digest"]
+    st.header(f"📋 Papers Summary ({len(digests)} papers)")
+    for paper, summary in digests:
+        render_paper(paper, summary)
+
+if "last_digest" in st.session_state:
+    digests, digest_text = st.session_state["last_digest"]
+    if "email_future" in st.session_state:
+        email_status()
+    show_email_outcome()
+    
     # Download option
     if digests:
         st.header("💾 Download Options")
         
-        # Create downloadable text version
-        text_content = f"ArXiv Digest - {date.today().strftime('%B %d, %Y')}\n"
-        text_content += f"Keywords: {keywords}\n"
-        text_content += "=" * 60 + "\n\n"
-        
-        for paper, summary in digests:
-            text_content += f"Title: {paper.title}\n"
-            text_content += f"Authors: {', '.join([author.name for author in paper.authors[:3]])}\n"
-            text_content += f"Published: {paper.published.strftime('%Y-%m-%d')}\n"
-            text_content += f"PDF: {paper.pdf_url}\n"
-            text_content += f"arXiv: {paper.entry_id}\n\n"
-            text_content += "Summary:\n" + summary + "\n\n"
-            text_content += "-" * 60 + "\n\n"
-        
         st.download_button(
             label="📄 Download as Text",
-            data=text_content,
+            data=digest_text,
             file_name=f"arxiv_digest_{date.today().strftime('%Y%m%d')}.txt",
             mime="text/plain"
         )
\ No newline at end of file
@@ -12,7 +12,7 @@ import argparse
 import os
 from datetime import date
 from dotenv import load_dotenv
-from streamlit_arxiv_digest import send_email
+from core import send_email
 
 # Load environment variables
 load_dotenv()